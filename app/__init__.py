@@ -8,16 +8,27 @@ ORGANIZATION_NAME = ""
 
 def run():
     import locale
+    import sys
 
-    from PySide6.QtWidgets import QApplication
-    from .application import Application
+    if "--startup-profile" in sys.argv[1:]:
+        from .startupprofile import start_profiler
+
+        start_profiler()
+
+    from PySide6.QtCore import QCoreApplication
+
+    # Headless mode must not even import the widget modules
+    if "--headless" in sys.argv[1:]:
+        from .daemon import HeadlessApplication as Application
+    else:
+        from .application import Application
 
     locale.setlocale(locale.LC_ALL, "")
 
-    QApplication.setOrganizationName(ORGANIZATION_NAME)
-    QApplication.setOrganizationDomain(DOMAIN_NAME)
-    QApplication.setApplicationName(APP_NAME)
-    QApplication.setApplicationVersion(VERSION)
+    QCoreApplication.setOrganizationName(ORGANIZATION_NAME)
+    QCoreApplication.setOrganizationDomain(DOMAIN_NAME)
+    QCoreApplication.setApplicationName(APP_NAME)
+    QCoreApplication.setApplicationVersion(VERSION)
 
     app = Application()
     return app.exec()
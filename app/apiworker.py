@@ -1,19 +1,204 @@
-import json
+import hashlib
+import math
 import logging
+import time
 import typing
 
-from PySide6.QtCore import Property, QObject, QTimer, Signal, Slot
-from PySide6.QtGui import QPixmap
+from PySide6.QtCore import Property, QByteArray, QObject, QTimer, QUrl, Signal, Slot
+from PySide6.QtGui import QImage
 from PySide6.QtNetwork import (
+    QAbstractSocket,
     QNetworkAccessManager,
     QNetworkReply,
-    QNetworkRequest,
     QRestAccessManager,
     QRestReply,
 )
+from PySide6.QtWebSockets import QWebSocket
+
+from app.artworkcache import ArtworkCache
+from app.commands import Command, CommandQueue, CommandTracker
+from app.imagedecoder import ImageDecoder
+from app.metrics import registry
+from app.options import server_url
+from app.payloads import (
+    Thumbnail,
+    TrackInfo,
+    loads,
+    parse_next_track,
+    parse_state,
+    parse_track,
+)
+from app.playerstate import PlayerSnapshot, PositionClock
+from app.pollscheduler import PollPolicy, PollScheduler
+from app.snapshotstore import SAVED_FIELDS, SavedState, SnapshotStore
+from app.transport import (
+    ARTWORK,
+    COMMAND,
+    POLL,
+    ConnectionStats,
+    build_request,
+    cancel_reply,
+    is_cancelled,
+    is_timeout,
+)
 
 _logger = logging.getLogger(__name__)
 
+HTTP_NOT_MODIFIED = 304
+HTTP_NOT_FOUND = 404
+# Statuses from here on are server errors, backed off like network errors
+HTTP_SERVER_ERROR = 500
+# Response validator headers mapped to the request headers that send them back
+VALIDATOR_HEADERS = {
+    "ETag": b"If-None-Match",
+    "Last-Modified": b"If-Modified-Since",
+}
+
+# Minimum time between two stateChanged signals (ms), about one frame
+FRAME_INTERVAL = 16
+
+REALTIME_PATH = "/socket.io/"
+REALTIME_RECONNECT_INTERVAL = 5000
+
+
+def _reply_status(reply: QRestReply) -> str:
+    """Metrics label for how a request ended."""
+    if is_cancelled(reply.networkReply()):
+        return "cancelled"
+    if is_timeout(reply.networkReply()):
+        return "timeout"
+    if reply.hasError():
+        return "error"
+    return str(reply.httpStatus())
+
+
+def _error_string(reply: QRestReply) -> str:
+    if is_timeout(reply.networkReply()):
+        return "Timed out"
+    if reply.hasError():
+        return reply.errorString()
+    return f"HTTP status {reply.httpStatus()}"
+
+
+def select_thumbnail(thumbnails: typing.Sequence[Thumbnail], size: int) -> str:
+    """Returns the url of the smallest thumbnail covering a size x size square.
+
+    Falls back to the largest thumbnail if none is big enough and to the
+    first one if the sizes are unknown.
+    """
+    best = None
+    largest = None
+    for thumbnail in thumbnails:
+        thumbnail_size = min(thumbnail.width, thumbnail.height)
+        if largest is None or thumbnail_size > largest[0]:
+            largest = (thumbnail_size, thumbnail)
+        if thumbnail_size >= size and (best is None or thumbnail_size < best[0]):
+            best = (thumbnail_size, thumbnail)
+
+    if best is not None:
+        return best[1].url
+    if largest is not None and largest[0] > 0:
+        return largest[1].url
+    return thumbnails[0].url
+
+
+def realtime_url(server: str) -> str:
+    """Builds the Socket.IO websocket URL for the given server URL."""
+    url = QUrl(server)
+    url.setScheme("wss" if url.scheme() == "https" else "ws")
+    url.setPath(REALTIME_PATH)
+    url.setQuery("EIO=4&transport=websocket")
+    return url.toString()
+
+
+class RealtimeClient(QObject):
+    """Minimal Socket.IO client (Engine.IO v4, websocket transport only).
+
+    Only the pieces needed to receive server pushed events on the default
+    namespace are implemented: the open handshake, ping/pong heartbeats,
+    namespace connect and event packets.
+    """
+
+    connected = Signal()
+    disconnected = Signal()
+    eventReceived = Signal(str, object)
+
+    def __init__(self, url: str, parent=None):
+        super().__init__(parent)
+        self._url = url
+        self._connected = False
+
+        self._socket = QWebSocket(parent=self)
+        self._socket.textMessageReceived.connect(self._handle_message)
+        self._socket.disconnected.connect(self._handle_disconnected)
+        self._socket.errorOccurred.connect(self._handle_error)
+
+        # Closes the socket if the server stops sending heartbeats
+        self._heartbeat_timer = QTimer(self, singleShot=True)
+        self._heartbeat_timer.timeout.connect(self._handle_heartbeat_timeout)
+
+    def isConnected(self) -> bool:
+        return self._connected
+
+    def open(self):
+        _logger.debug("Opening realtime connection to %s", self._url)
+        self._socket.open(QUrl(self._url))
+
+    def close(self):
+        self._heartbeat_timer.stop()
+        self._socket.close()
+
+    def _handle_message(self, message: str):
+        packet_type, payload = message[:1], message[1:]
+        if packet_type == "0":
+            # Engine.IO open, connect to the default namespace
+            handshake = loads(payload)
+            self._heartbeat_timer.setInterval(
+                handshake.get("pingInterval", 25000)
+                + handshake.get("pingTimeout", 20000)
+            )
+            self._heartbeat_timer.start()
+            self._socket.sendTextMessage("40")
+        elif packet_type == "1":
+            self.close()
+        elif packet_type == "2":
+            self._heartbeat_timer.start()
+            self._socket.sendTextMessage("3")
+        elif packet_type == "4":
+            self._handle_socketio_packet(payload)
+
+    def _handle_socketio_packet(self, packet: str):
+        packet_type, payload = packet[:1], packet[1:]
+        if packet_type == "0":
+            self._connected = True
+            _logger.info(f"Realtime connection to {self._url} established")
+            self.connected.emit()
+        elif packet_type == "1":
+            self.close()
+        elif packet_type == "2":
+            # Strip the optional acknowledgement id
+            args = loads(payload.lstrip("0123456789"))
+            if isinstance(args, list) and args:
+                self.eventReceived.emit(args[0], args[1] if len(args) > 1 else None)
+        elif packet_type == "4":
+            _logger.warning(f"Realtime connection refused: {payload}")
+            self.close()
+
+    def _handle_heartbeat_timeout(self):
+        _logger.warning("Realtime connection timed out")
+        self._socket.abort()
+
+    def _handle_error(self, error: QAbstractSocket.SocketError):
+        _logger.debug("Realtime socket error: %s", self._socket.errorString())
+
+    def _handle_disconnected(self):
+        self._heartbeat_timer.stop()
+        was_connected = self._connected
+        self._connected = False
+        if was_connected:
+            _logger.info(f"Realtime connection to {self._url} lost")
+        self.disconnected.emit()
+
 
 class ApiWorker(QObject):
     titleChanged = Signal(str)
@@ -21,20 +206,28 @@ class ApiWorker(QObject):
     playingChanged = Signal(bool)
     likedChanged = Signal(bool)
     dislikedChanged = Signal(bool)
-    artworkChanged = Signal(QPixmap)
+    artworkChanged = Signal(QImage)
+    commandFailed = Signal(str, str)
+    # PlayerSnapshot and the frozenset of changed field names, coalesced so
+    # it is emitted at most once per frame however many fields changed.
+    stateChanged = Signal(object, object)
 
     def __init__(
         self,
         server: str = "http://localhost:13091",
         update_time: int = 1000,
+        realtime: bool = False,
+        poll_policy: PollPolicy | None = None,
+        artwork_cache: ArtworkCache | None = None,
+        network_manager: QNetworkAccessManager | None = None,
+        fetch_artwork: bool = True,
+        snapshot_store: SnapshotStore | None = None,
         parent=None,
         objectName=None,
     ):
         super().__init__(parent, objectName=objectName)
 
-        if server.endswith("/"):
-            server = server[:-1]
-        self._server = server
+        self._server = server_url(server)
 
         self._title: str | None = None
         self._artist: str | None = None
@@ -42,12 +235,59 @@ class ApiWorker(QObject):
         self._liked: bool = False
         self._disliked: bool = False
         self._artwork_url: str | None = None
-        self._artwork: QPixmap | None = None
+        self._artwork: QImage | None = None
+        self._artwork_cache = artwork_cache or ArtworkCache()
+        self._fetch_artwork = fetch_artwork
+        self._thumbnails: tuple[Thumbnail, ...] = ()
+        self._track_id: str | None = None
+        self._next_track: TrackInfo | None = None
+        self._prefetch_url: str | None = None
+        self._prefetch_reply: QNetworkReply | None = None
+        self._artwork_size = 64
+        self._device_pixel_ratio = 1.0
+        self._decoder = ImageDecoder(parent=self)
+        self._decoder.decoded.connect(self._handle_artwork_decoded)
+        self._snapshot: PlayerSnapshot | None = None
+        self._snapshot_store = snapshot_store
+        # Set while showing the state restored from the last session
+        self._stale = False
+        self._state_timer = QTimer(self, interval=FRAME_INTERVAL, singleShot=True)
+        self._state_timer.timeout.connect(self._emit_state)
 
         self._active_requests: dict[str, QNetworkReply] = {}
-        self._timer = QTimer(self, interval=update_time)
-        self._timer.timeout.connect(lambda: self._update_status())
-        self._network_manager = QRestAccessManager(QNetworkAccessManager(self))
+        self._connection_stats = ConnectionStats()
+        self._commands = CommandTracker()
+        self._command_timer = QTimer(self, singleShot=True)
+        self._command_timer.timeout.connect(self._expire_commands)
+        self._command_queue = CommandQueue()
+        self._state_setters: dict[str, typing.Callable[[bool], None]] = {
+            "playing": self.setPlaying,
+            "liked": self.setLiked,
+            "disliked": self.setDisliked,
+        }
+        self._validators: dict[str, dict[bytes, QByteArray]] = {}
+        self._body_digests: dict[str, bytes] = {}
+        self._unsupported_endpoints: set[str] = set()
+        self._clock = PositionClock()
+        self._scheduler = PollScheduler(
+            poll_policy or PollPolicy(interval=update_time), self
+        )
+        self._scheduler.pollRequested.connect(self._update_status)
+        self._network_manager = QRestAccessManager(
+            network_manager or QNetworkAccessManager(self), self
+        )
+
+        self._running = False
+        self._realtime: RealtimeClient | None = None
+        self._reconnect_timer = QTimer(
+            self, interval=REALTIME_RECONNECT_INTERVAL, singleShot=True
+        )
+        if realtime:
+            self._realtime = RealtimeClient(realtime_url(server), self)
+            self._realtime.connected.connect(self._handle_realtime_connected)
+            self._realtime.disconnected.connect(self._handle_realtime_disconnected)
+            self._realtime.eventReceived.connect(self._handle_realtime_event)
+            self._reconnect_timer.timeout.connect(self._realtime.open)
 
     def isPlaying(self) -> bool:
         return self._playing
@@ -55,7 +295,10 @@ class ApiWorker(QObject):
     def setPlaying(self, value: bool):
         if value != self._playing:
             self._playing = value
+            self._scheduler.setPlaying(value)
+            self._clock.setPlaying(value)
             self.playingChanged.emit(value)
+            self._schedule_state()
 
     def title(self) -> str | None:
         return self._title
@@ -64,6 +307,7 @@ class ApiWorker(QObject):
         if value != self._title:
             self._title = value
             self.titleChanged.emit(value)
+            self._schedule_state()
 
     def artist(self) -> str | None:
         return self._artist
@@ -72,6 +316,7 @@ class ApiWorker(QObject):
         if value != self._artist:
             self._artist = value
             self.artistChanged.emit(value)
+            self._schedule_state()
 
     def isLiked(self) -> bool:
         return self._liked
@@ -80,6 +325,7 @@ class ApiWorker(QObject):
         if value != self._liked:
             self._liked = value
             self.likedChanged.emit(value)
+            self._schedule_state()
 
     def isDisliked(self) -> bool:
         return self._disliked
@@ -88,37 +334,157 @@ class ApiWorker(QObject):
         if value != self._disliked:
             self._disliked = value
             self.dislikedChanged.emit(value)
+            self._schedule_state()
 
-    def artwork(self) -> QPixmap | None:
+    def artwork(self) -> QImage | None:
         return self._artwork
 
-    def setArtwork(self, value: QPixmap):
+    def setArtwork(self, value: QImage):
         self._artwork = value
         self.artworkChanged.emit(value)
+        self._schedule_state()
+
+    def duration(self) -> float:
+        """Length of the current track in seconds, 0 if unknown."""
+        return self._clock.duration()
 
-    def start(self):
-        self._timer.start(1000)
+    def position(self) -> float:
+        """Position in the current track in seconds, interpolated locally."""
+        return self._clock.position()
 
+    def snapshot(self) -> PlayerSnapshot:
+        position, position_time = self._clock.anchor()
+        return PlayerSnapshot(
+            title=self._title or "",
+            artist=self._artist or "",
+            playing=self._playing,
+            liked=self._liked,
+            disliked=self._disliked,
+            artwork=self._artwork,
+            duration=self._clock.duration(),
+            position=position,
+            position_time=position_time,
+            stale=self._stale,
+        )
+
+    def isStale(self) -> bool:
+        """Whether the state was restored and the server has not answered."""
+        return self._stale
+
+    def restoreState(self, state: SavedState):
+        """Shows a state saved in the last session until the first sync.
+
+        Call before start, the artwork is then loaded from the cache.
+        """
+        self._title = state.title
+        self._artist = state.artist
+        # Paused, so the position does not run on while nothing confirms it
+        self._playing = False
+        self._liked = state.liked
+        self._disliked = state.disliked
+        if state.artwork_url:
+            self._thumbnails = (Thumbnail(state.artwork_url),)
+        self._scheduler.setPlaying(False)
+        self._clock.reset(state.duration)
+        self._clock.sync(state.position)
+        self._clock.setPlaying(False)
+        self._stale = True
+
+    def savedState(self) -> SavedState:
+        return SavedState(
+            title=self._title or "",
+            artist=self._artist or "",
+            playing=self._playing,
+            liked=self._liked,
+            disliked=self._disliked,
+            duration=self._clock.duration(),
+            position=self._clock.position(),
+            artwork_url=self._artwork_url,
+            saved_at=time.time(),
+        )
+
+    def server(self) -> str:
+        return self._server
+
+    def start(self, delay: int = 0):
+        """Starts polling, after delay milliseconds."""
+        self._running = True
+        if self._stale:
+            # The restored artwork, from the cache if it is still there
+            self._update_artwork()
+            self._schedule_state()
+        # Poll until the realtime connection (if any) is established
+        self._scheduler.start(delay)
+        if self._realtime:
+            self._realtime.open()
+
+    @Slot()
     def stop(self):
-        self._timer.stop()
+        self._running = False
+        self._scheduler.stop()
+        self._reconnect_timer.stop()
+        self._command_timer.stop()
+        if self._realtime:
+            self._realtime.close()
+        if self._snapshot_store:
+            # Saved with the position it is stopped at
+            if not self._stale:
+                self._snapshot_store.save(self._server, self.savedState())
+            self._snapshot_store.flush()
+        _logger.debug("Artwork cache stats: %s", self._artwork_cache.stats())
+        _logger.debug("Command stats: %s", self._command_queue.stats())
+
+    def setArtworkSize(self, size: int, device_pixel_ratio: float = 1.0):
+        """Sets the size artwork is displayed at in device independent pixels."""
+        if (size, device_pixel_ratio) == (self._artwork_size, self._device_pixel_ratio):
+            return
+
+        self._artwork_size = size
+        self._device_pixel_ratio = device_pixel_ratio
+        self._artwork_cache.clearMemory()
+        self._artwork_url = None
+        self._update_artwork()
+
+    def commandStats(self) -> dict[str, int]:
+        """Counts of sent, queued, cancelled and dropped commands."""
+        return self._command_queue.stats()
+
+    def connectionStats(self) -> dict[str, int]:
+        """Counts of requests, new and reused connections and timeouts."""
+        return self._connection_stats.stats()
+
+    def artworkCache(self) -> ArtworkCache:
+        return self._artwork_cache
+
+    def isRealtime(self) -> bool:
+        """Whether state is currently being pushed by the server."""
+        return self._realtime is not None and self._realtime.isConnected()
+
+    @Slot(bool)
+    def setUiVisible(self, visible: bool):
+        """Lets the worker poll less often while nobody is looking."""
+        self._scheduler.setVisible(visible)
 
     @Slot()
     def requestPreviousTrack(self):
-        self._post_request("track/prev", {}, lambda reply: self._update_status())
+        # Lands somewhere other than the track shown optimistically
+        self._commands.cancel("track")
+        self._send_command(Command("track/prev"))
 
     @Slot()
     def requestNextTrack(self):
-        self._post_request("track/next", {}, lambda reply: self._update_status())
+        if self._send_command(Command("track/next")):
+            self._apply_next_track()
+        else:
+            self._commands.cancel("track")
 
     @Slot()
     def requestToggleLike(self):
-        if self._post_request("track/like", {}, lambda reply: self._update_status()):
-            self.setLiked(not self._liked)
+        self._send_command(Command("track/like", "liked", not self._liked))
 
     @Slot()
     def requestToggleDislike(self):
-        if self._post_request("track/dislike", {}, lambda reply: self._update_status()):
-            self.setDisliked(not self._disliked)
+        self._send_command(Command("track/dislike", "disliked", not self._disliked))
 
     @Slot()
     def requestTogglePlayPause(self):
@@ -127,8 +493,7 @@ class ApiWorker(QObject):
         else:
             endpoint = "track/play"
 
-        if self._post_request(endpoint, {}, self._handle_play_pause_reply):
-            self.isPlaying = not self._playing
+        self._send_command(Command(endpoint, "playing", not self._playing))
 
     @Slot()
     def requestPlay(self):
@@ -140,10 +505,24 @@ class ApiWorker(QObject):
         if self._playing:
             self.requestTogglePlayPause()
 
+    def _schedule_state(self):
+        if not self._state_timer.isActive():
+            self._state_timer.start()
+
+    def _emit_state(self):
+        snapshot = self.snapshot()
+        changed = snapshot.diff(self._snapshot)
+        if changed:
+            self._snapshot = snapshot
+            self.stateChanged.emit(snapshot, changed)
+            # Restored states are already saved
+            if self._snapshot_store and not self._stale and changed & SAVED_FIELDS:
+                self._snapshot_store.save(self._server, self.savedState())
+
     @Slot()
     def _update_status(self):
-        self._get_request("track", self._handle_track_reply)
-        self._get_request("track/state", self._handle_state_reply)
+        self._get_request("track", self._apply_track_data)
+        self._get_request("track/state", self._apply_state_data)
 
     def _has_active_request(self, endpoint: str) -> bool:
         if endpoint in self._active_requests:
@@ -162,16 +541,37 @@ class ApiWorker(QObject):
         return False
 
     def _get_request(
-        self, endpoint: str, slot: typing.Callable[..., typing.Any]
+        self, endpoint: str, slot: typing.Callable[[typing.Any], typing.Any]
     ) -> QNetworkReply | None:
+        """Sends a conditional GET request for a JSON endpoint.
+
+        The slot is called with the decoded payload, but only if it changed
+        since the last reply for the same endpoint.
+        """
         url = f"{self._server}/{endpoint}"
-        _logger.debug(f"Requested GET request for {url}")
+        _logger.debug("Requested GET request for %s", url)
+        if endpoint in self._unsupported_endpoints:
+            return None
+
         if self._has_active_request(endpoint):
-            _logger.debug(f"Request for {url} already in progress... ignoring")
+            _logger.debug("Request for %s already in progress... ignoring", url)
             return None
 
-        _logger.debug(f"Sending GET request for {url}")
-        reply = self._network_manager.get(QNetworkRequest(url), self, slot)
+        request = build_request(url, POLL)
+        for header, value in self._validators.get(endpoint, {}).items():
+            request.setRawHeader(header, value)
+
+        _logger.debug("Sending GET request for %s", url)
+        reply = self._network_manager.get(
+            request,
+            self,
+            self._measured(
+                endpoint,
+                "GET",
+                lambda reply: self._handle_get_reply(endpoint, slot, reply),
+            ),
+        )
+        self._connection_stats.track(reply)
         self._active_requests[endpoint] = reply
         return reply
 
@@ -182,100 +582,449 @@ class ApiWorker(QObject):
         slot: typing.Callable[..., typing.Any],
     ) -> QNetworkReply | None:
         url = f"{self._server}/{endpoint}"
-        _logger.debug(f"Requested POST request for {url}")
+        _logger.debug("Requested POST request for %s", url)
         if self._has_active_request(endpoint):
-            _logger.debug(f"Request for {url} already in progress... ignoring")
+            _logger.debug("Request for %s already in progress... ignoring", url)
             return None
 
-        _logger.debug(f"Sending POST request for {url}")
-        reply = self._network_manager.post(QNetworkRequest(url), data, self, slot)
+        _logger.debug("Sending POST request for %s", url)
+        reply = self._network_manager.post(
+            build_request(url, COMMAND),
+            data,
+            self,
+            self._measured(endpoint, "POST", slot),
+        )
+        self._connection_stats.track(reply)
         self._active_requests[endpoint] = reply
+        # Commands change local state, make sure the next poll is applied
+        self._invalidate_validators()
+        self._scheduler.boost()
         return reply
 
-    def _handle_track_reply(self, reply: QRestReply):
+    def _measured(
+        self, endpoint: str, method: str, slot: typing.Callable[[QRestReply], None]
+    ) -> typing.Callable[[QRestReply], None]:
+        """Wraps a reply slot to record the request in the metrics registry.
+
+        Must be called right before the request is sent.
+        """
+        labels = {"server": self._server, "endpoint": endpoint, "method": method}
+        registry.addGauge("ytmdr_http_requests_in_flight", 1, labels)
+        started = time.perf_counter()
+
+        def handle(reply: QRestReply):
+            elapsed = (time.perf_counter() - started) * 1000
+            status = _reply_status(reply)
+            registry.addGauge("ytmdr_http_requests_in_flight", -1, labels)
+            registry.increment(
+                "ytmdr_http_requests_total", {**labels, "status": status}
+            )
+            if status != "cancelled":
+                registry.observe("ytmdr_http_request_duration_ms", elapsed, labels)
+            if status not in ("cancelled", "304") and not reply.isSuccess():
+                registry.increment("ytmdr_http_request_errors_total", labels)
+            slot(reply)
+
+        return handle
+
+    def _handle_get_reply(
+        self,
+        endpoint: str,
+        slot: typing.Callable[[typing.Any], typing.Any],
+        reply: QRestReply,
+    ):
         try:
-            if reply.isSuccess():
-                text = reply.readText()
-                data = json.loads(text)
-                if not data:
-                    return
-
-                if "video" in data:
-                    video_data = data["video"]
-                    if "title" in video_data:
-                        self.setTitle(video_data["title"])
-
-                    if "author" in video_data:
-                        self.setArtist(video_data["author"])
-
-                    if "thumbnail" in video_data:
-                        if "thumbnails" in video_data["thumbnail"]:
-                            thumbnails = video_data["thumbnail"]["thumbnails"]
-                            if isinstance(thumbnails, list) and thumbnails:
-                                url = thumbnails[0]["url"]
-                                if url != self._artwork_url:
-                                    self._artwork_url = url
-                                    self._network_manager.get(
-                                        QNetworkRequest(url),
-                                        self,
-                                        self._handle_artwork_reply,
-                                    )
-            else:
-                _logger.warning(f"Failed to get track: {reply.errorString()}")
+            if reply.hasError() or reply.httpStatus() >= HTTP_SERVER_ERROR:
+                # Only warn once while the server stays unreachable or broken
+                error = _error_string(reply)
+                if self._scheduler.reportFailure():
+                    _logger.warning(f"Failed to get {endpoint}: {error}")
+                else:
+                    _logger.debug("Failed to get %s: %s", endpoint, error)
+                return
+
+            if self._scheduler.reportSuccess():
+                _logger.info(f"Connection to {self._server} restored")
+
+            if reply.httpStatus() == HTTP_NOT_FOUND:
+                _logger.info(f"Server does not support {endpoint}")
+                self._unsupported_endpoints.add(endpoint)
+                return
+
+            if reply.httpStatus() != HTTP_NOT_MODIFIED and not reply.isSuccess():
+                _logger.warning(f"Failed to get {endpoint}: {_error_string(reply)}")
+                return
+
+            if reply.httpStatus() == HTTP_NOT_MODIFIED:
+                _logger.debug("%s not modified", endpoint)
+                return
+
+            network_reply = reply.networkReply()
+            validators = {}
+            for header, conditional_header in VALIDATOR_HEADERS.items():
+                if network_reply.hasRawHeader(header):
+                    validators[conditional_header] = network_reply.rawHeader(header)
+            self._validators[endpoint] = validators
+
+            # Servers without validators still send identical bodies when
+            # nothing changed, skip those before decoding anything.
+            body = reply.readBody().data()
+            digest = hashlib.blake2b(body, digest_size=16).digest()
+            if self._body_digests.get(endpoint) == digest:
+                _logger.debug("%s unchanged", endpoint)
+                return
+            self._body_digests[endpoint] = digest
+
+            data = loads(body)
+            if data:
+                slot(data)
+            # The restored state is replaced once the track is known
+            if endpoint == "track" and self._stale:
+                self._stale = False
+                self._schedule_state()
         except Exception as ex:
             _logger.exception(ex)
 
-    def _handle_state_reply(self, reply: QRestReply):
-        try:
-            if reply.isSuccess():
-                text = reply.readText()
-                data = json.loads(text)
-                if not data:
-                    return
+    def _invalidate_validators(self):
+        self._validators.clear()
+        self._body_digests.clear()
+
+    def _handle_realtime_connected(self):
+        self._scheduler.stop()
+        # Pushes only carry changes, fetch the full state once
+        self._update_status()
 
-                if "playing" in data:
-                    self.setPlaying(data["playing"])
+    def _handle_realtime_disconnected(self):
+        if not self._running:
+            return
 
-                if "liked" in data:
-                    self.setLiked(data["liked"])
+        if not self._scheduler.isActive():
+            _logger.info("Falling back to polling")
+            self._scheduler.start()
+        self._reconnect_timer.start()
 
-                if "disliked" in data:
-                    self.setDisliked(data["disliked"])
-            else:
-                _logger.warning(f"Failed to get state: {reply.errorString()}")
+    def _handle_realtime_event(self, event: str, data: typing.Any):
+        try:
+            if not isinstance(data, dict) or not data:
+                return
+
+            # Pushed state supersedes whatever the last poll returned
+            self._invalidate_validators()
+            if event == "track":
+                self._apply_track_data(data)
+            elif event == "state":
+                self._apply_state_data(data)
         except Exception as ex:
             _logger.exception(ex)
 
-    def _handle_play_pause_reply(self, reply: QRestReply):
+    def _apply_track_data(self, data: typing.Any):
+        track = parse_track(data)
+        if track is None:
+            return
+
+        track_id = track.trackId()
+        if not self._commands.reconcile("track", track_id):
+            _logger.debug("Ignoring stale track while a skip is pending")
+            return
+
+        if track.title is not None:
+            self.setTitle(track.title)
+
+        if track.artist is not None:
+            self.setArtist(track.artist)
+
+        if track.thumbnails:
+            self._thumbnails = track.thumbnails
+            self._update_artwork()
+
+        if track_id != self._track_id:
+            self._track_id = track_id
+            self._clock.reset()
+            self._prefetch_next_track()
+
+        if track.duration is not None:
+            self._clock.setDuration(track.duration)
+        self._schedule_state()
+
+    def _apply_state_data(self, data: typing.Any):
+        state = parse_state(data)
+        if state is None:
+            return
+
+        for field in self._state_setters:
+            value = getattr(state, field)
+            if value is not None:
+                self._apply_server_value(field, value)
+
+        if state.progress is not None:
+            # Only resynced on drift, play/pause re-anchors in setPlaying
+            if self._clock.sync(state.progress):
+                self._schedule_state()
+            remaining = self._clock.remaining()
+            if remaining is not None:
+                self._scheduler.setRemainingTime(int(remaining * 1000))
+
+    def _send_command(self, command: Command) -> bool:
+        """Sends a command, applying its state change right away.
+
+        Commands behind one that is still in flight are queued and coalesced,
+        returns whether the command was sent right away.
+        """
+        if command.field is not None:
+            # State fields are stored in the matching private attribute
+            command.previous = getattr(self, f"_{command.field}")
+            self._commands.begin(command)
+            self._state_setters[command.field](command.expected)
+            self._schedule_command_timeout()
+
+        if self._command_queue.submit(command) is None:
+            _logger.debug("Queued %s", command.endpoint)
+            return False
+
+        self._post_command(command)
+        return True
+
+    def _post_command(self, command: Command):
+        reply = self._post_request(
+            command.endpoint,
+            {},
+            lambda reply: self._handle_command_reply(command, reply),
+        )
+        if reply is None:
+            _logger.warning(f"Dropped {command.endpoint}")
+            self._command_queue.discard(command)
+            self._command_queue.complete(command)
+
+    def _handle_command_reply(self, command: Command, reply: QRestReply):
         try:
-            if reply.isSuccess():
-                text = reply.readText()
-                data = json.loads(text)
-                if not data:
-                    return
-
-                if "isPlaying" in data:
-                    self.setPlaying(data["isPlaying"])
-            else:
-                _logger.warning(f"Failed to toggle play/pause: {reply.errorString()}")
+            if not reply.isSuccess():
+                error = _error_string(reply)
+                _logger.warning(f"Failed to send {command.endpoint}: {error}")
+                # Whatever is queued behind it was relying on it
+                self._command_queue.discard(command)
+                if command.field is None:
+                    # Whatever was shown optimistically is wrong, resync,
+                    # including the replies ignored meanwhile
+                    self._commands.cancel("track")
+                    self._invalidate_validators()
+                    self._update_status()
+                else:
+                    self._commands.cancel(command.field)
+                    self._state_setters[command.field](command.previous)
+                self.commandFailed.emit(command.endpoint, error)
+                return
+
+            body = reply.readBody().data()
+            data = loads(body) if body else None
+            if isinstance(data, dict) and "isPlaying" in data:
+                # Play/pause replies carry the resulting state
+                self._commands.resolve(command)
+                self._apply_server_value("playing", data["isPlaying"])
         except Exception as ex:
             _logger.exception(ex)
+        finally:
+            next_command = self._command_queue.complete(command)
+            if next_command is not None:
+                self._post_command(next_command)
+
+    def _schedule_command_timeout(self):
+        remaining = self._commands.nextTimeout()
+        if remaining is None:
+            self._command_timer.stop()
+        else:
+            self._command_timer.start(math.ceil(remaining * 1000))
+
+    def _expire_commands(self):
+        expired = self._commands.expire()
+        if expired:
+            _logger.debug(
+                "%s not confirmed in time, resyncing",
+                ", ".join(command.endpoint for command in expired),
+            )
+            # The replies ignored meanwhile come back unchanged, or as 304
+            self._invalidate_validators()
+            self._update_status()
+        self._schedule_command_timeout()
+
+    def _apply_server_value(self, field: str, value: typing.Any):
+        if self._commands.reconcile(field, value):
+            self._state_setters[field](value)
+        else:
+            _logger.debug("Ignoring stale %s while a command is pending", field)
+
+    def _prefetch_next_track(self):
+        """Fetches the queue to warm up the next track's artwork."""
+        self._next_track = None
+        self._cancel_prefetch()
+        self._get_request("queue", self._apply_queue_data)
+
+    def _apply_queue_data(self, data: typing.Any):
+        self._next_track = parse_next_track(data)
+        if self._next_track is None or not self._next_track.thumbnails:
+            return
+
+        if not self._fetch_artwork:
+            return
+
+        url = select_thumbnail(self._next_track.thumbnails, self._artwork_pixel_size())
+        if url == self._artwork_url or self._artwork_cache.image(url) is not None:
+            return
+
+        self._prefetch_url = url
+        data = self._artwork_cache.data(url)
+        if data is not None:
+            self._decoder.decode(url, data, self._artwork_pixel_size())
+            return
+
+        _logger.debug("Prefetching artwork %s", url)
+        self._prefetch_reply = self._get_artwork(url)
+
+    def _cancel_prefetch(self):
+        # Only one prefetch at a time, unless it is the artwork we need now
+        reply, self._prefetch_reply = self._prefetch_reply, None
+        url, self._prefetch_url = self._prefetch_url, None
+        if reply is None or url == self._artwork_url:
+            return
+
+        try:
+            if not reply.isFinished():
+                _logger.debug("Cancelling prefetch of %s", url)
+                cancel_reply(reply)
+        except RuntimeError:
+            # Reply already deleted
+            pass
+
+    def _is_prefetching(self, url: str) -> bool:
+        """Whether url is being prefetched, downloaded or decoded."""
+        if url != self._prefetch_url:
+            return False
+
+        reply = self._prefetch_reply
+        if reply is None:
+            # Downloaded or read from disk, being decoded
+            return True
+
+        try:
+            return not reply.isFinished()
+        except RuntimeError:
+            # Reply already deleted
+            return False
+
+    def _apply_next_track(self):
+        """Shows the prefetched next track until the server confirms it."""
+        next_track, self._next_track = self._next_track, None
+        if next_track is None:
+            return
+
+        # Titles are not unique enough to tell the tracks apart
+        if next_track.video_id is not None:
+            # Polls and pushes still carrying the old track are stale
+            self._commands.begin(
+                Command(
+                    "track/next", "track", next_track.video_id, self._track_id
+                )
+            )
+            self._schedule_command_timeout()
+
+        self._clock.reset()
+        self._schedule_state()
+        if next_track.title is not None:
+            self.setTitle(next_track.title)
+        if next_track.artist is not None:
+            self.setArtist(next_track.artist)
+
+        if next_track.thumbnails:
+            self._thumbnails = next_track.thumbnails
+            self._update_artwork()
+
+    def _artwork_pixel_size(self) -> int:
+        return math.ceil(self._artwork_size * self._device_pixel_ratio)
+
+    def _update_artwork(self):
+        if not self._fetch_artwork or not self._thumbnails:
+            return
+
+        url = select_thumbnail(self._thumbnails, self._artwork_pixel_size())
+        if url != self._artwork_url:
+            self._artwork_url = url
+            self._request_artwork(url)
+
+    def _request_artwork(self, url: str):
+        image = self._artwork_cache.image(url)
+        if image is not None:
+            _logger.debug("Artwork for %s served from cache", url)
+            self.setArtwork(image)
+            return
+
+        if self._is_prefetching(url):
+            # Already on its way, it is set once decoded
+            return
+
+        data = self._artwork_cache.data(url)
+        if data is not None:
+            self._decoder.decode(url, data, self._artwork_pixel_size())
+            return
+
+        self._get_artwork(url)
+
+    def _get_artwork(self, url: str) -> QNetworkReply:
+        reply = self._network_manager.get(
+            build_request(url, ARTWORK),
+            self,
+            self._measured(
+                "artwork", "GET", lambda reply: self._handle_artwork_reply(url, reply)
+            ),
+        )
+        self._connection_stats.track(reply)
+        return reply
+
+    def _handle_artwork_reply(self, url: str, reply: QRestReply):
+        prefetched = url == self._prefetch_url
+        if prefetched:
+            # Only decoding is left, if anything
+            self._prefetch_reply = None
 
-    def _handle_artwork_reply(self, reply: QRestReply):
         try:
             if reply.isSuccess():
-                pixmap = QPixmap()
-                pixmap.loadFromData(reply.readBody())
-                self.setArtwork(pixmap)
-            else:
-                _logger.warning(f"Failed to get artwork: {reply.errorString()}")
+                data = reply.readBody().data()
+                self._artwork_cache.insertData(url, data)
+                self._decoder.decode(url, data, self._artwork_pixel_size())
+                return
+
+            if prefetched:
+                self._prefetch_url = None
+            if is_cancelled(reply.networkReply()):
+                _logger.debug("Artwork request for %s cancelled", url)
+                return
+
+            _logger.warning(f"Failed to get artwork: {_error_string(reply)}")
+            # The track changed while prefetching, fetch it once more
+            if prefetched and url == self._artwork_url:
+                self._get_artwork(url)
         except Exception as ex:
             _logger.exception(ex)
 
+    def _handle_artwork_decoded(self, url: str, image: QImage):
+        if url == self._prefetch_url:
+            self._prefetch_url = None
+            self._prefetch_reply = None
+
+        if image.isNull():
+            _logger.warning(f"Failed to decode artwork from {url}")
+            self._artwork_cache.remove(url)
+            return
+
+        # Pixmaps can only be created on the GUI thread, they are made from
+        # the image there
+        image.setDevicePixelRatio(self._device_pixel_ratio)
+        self._artwork_cache.insertImage(url, image)
+        if url == self._artwork_url:
+            self.setArtwork(image)
+
 
     isPlaying = Property(bool, isPlaying, setPlaying, notify=playingChanged) # type: ignore
     title = Property(str, title, setTitle, notify=titleChanged) # type: ignore
     artist = Property(str, artist, setArtist, notify=artistChanged) # type: ignore
     isLiked = Property(bool, isLiked, setLiked, notify=likedChanged) # type: ignore
     isDisliked = Property(bool, isDisliked, setDisliked, notify=dislikedChanged) # type: ignore
-    artwork = Property(QPixmap, artwork, setArtwork, notify=artworkChanged) # type: ignore
\ No newline at end of file
+    artwork = Property(QImage, artwork, setArtwork, notify=artworkChanged) # type: ignore
\ No newline at end of file
@@ -1,82 +1,136 @@
+import signal
 import sys
 
-from PySide6.QtCore import QCommandLineOption, QCommandLineParser, Qt
-from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import QApplication, QSystemTrayIcon
 
-from app.apiworker import ApiWorker
-from app.mediakeylistener import MediaKeyListener
-from app.widgets import MiniPlayerWidget
-
-from . import APP_DESCRIPTION
+from app.options import parse_options
+from app.snapshotstore import SnapshotStore
+from app.startupprofile import mark, report
+# Registers the :/icons resources
+from app.ui import rc_resources
 
 
 class Application:
+    """Shows the tray icon first and builds everything else once the event
+    loop runs, so the icon appears as early as possible on login.
+
+    The mini player (and the icon fonts with it), the network stack and
+    the hotkey backends are only imported at that point.
+    """
+
     def __init__(self):
         self._app = QApplication(sys.argv)
+        self._options = parse_options(self._app)
+        mark("options parsed")
+
+        self._tray_icon = QSystemTrayIcon(QIcon(":/icons/icon.png"))
+        # What played last time, until the server answers
+        self._snapshot_store = SnapshotStore()
+        state = self._snapshot_store.state(self._options.servers[0])
+        if state is not None:
+            self._tray_icon.setToolTip(f"{state.title}\n{state.artist}")
+        self._tray_icon.show()
+        mark("tray icon shown")
+
+        self._manager = None
+        self._miniplayer = None
+        self._hotkeys = None
+        self._mpris = None
+        self._history = None
+        self._metrics = None
+        self._signal_notifier = None
 
-        parser = QCommandLineParser()
-        parser.setApplicationDescription(APP_DESCRIPTION)
-        parser.addHelpOption()
-        parser.addVersionOption()
+    def exec(self):
+        QTimer.singleShot(0, self._start)
+        ret = self._app.exec()
+        if self._manager:
+            self._manager.stop()
+        if self._hotkeys:
+            self._hotkeys.stop()
+        if self._mpris:
+            self._mpris.unregister()
+        if self._history:
+            self._history.stop()
+        if self._metrics:
+            self._metrics.dump()
 
-        server_option = QCommandLineOption(
-            ["s", "server"],
-            "Server URL",
-            "server",
-            defaultValue="http://localhost:13091",
-        )
-        parser.addOption(server_option)
-        listener_option = QCommandLineOption(["l", "listen"], "Listen for hotkeys")
-        parser.addOption(listener_option)
-        parser.process(self._app)
-
-        server = parser.value(server_option)
-        listen = parser.isSet(listener_option)
-
-        self._worker = ApiWorker(server=server)
-        self._miniplayer = MiniPlayerWidget()
-
-        self._listener = None
-        if listen:
-            self._listener = MediaKeyListener()
-            self._listener.keyPressed.connect(
-                self._handle_key_press, Qt.ConnectionType.QueuedConnection
-            )
-            self._listener.start()
+        return ret
 
-        # Connect mini player signals to worker
-        self._miniplayer.playPauseTriggered.connect(self._worker.requestTogglePlayPause)
-        self._miniplayer.nextTriggered.connect(self._worker.requestNextTrack)
-        self._miniplayer.previousTriggered.connect(self._worker.requestPreviousTrack)
-        self._miniplayer.likeTriggered.connect(self._worker.requestToggleLike)
-        self._miniplayer.dislikeTriggered.connect(self._worker.requestToggleDislike)
+    def _start(self):
+        mark("event loop running")
+        from app.metrics import MetricsExporter
+        from app.signalnotifier import SignalNotifier
+        from app.widgets import MiniPlayerWidget
+        from app.workermanager import WorkerManager
 
-        # Connect worker signals to miniplayer
-        self._worker.titleChanged.connect(self._miniplayer.setTitle)
-        self._worker.artistChanged.connect(self._miniplayer.setArtist)
-        self._worker.playingChanged.connect(self._miniplayer.setPlaying)
-        self._worker.likedChanged.connect(self._miniplayer.setLiked)
-        self._worker.dislikedChanged.connect(self._miniplayer.setDisliked)
-        self._worker.artworkChanged.connect(self._miniplayer.setArtwork)
+        options = self._options
 
+        self._manager = WorkerManager(
+            options.servers,
+            realtime=options.realtime,
+            poll_policy=options.poll_policy,
+            snapshot_store=self._snapshot_store,
+        )
+        self._miniplayer = MiniPlayerWidget(tray_icon=self._tray_icon)
+        self._miniplayer.setTargets(options.servers)
+        self._miniplayer.setMarquee(options.marquee)
+        self._manager.setArtworkSize(
+            self._miniplayer.artworkSize(), self._miniplayer.devicePixelRatioF()
+        )
+        mark("mini player created")
 
-    def exec(self):
-        self._worker.start()
-        ret = self._app.exec()
-        self._worker.stop()
-        if self._listener:
-            self._listener.stop()
+        if options.listen:
+            from app.hotkeys import HotkeyEngine
 
-        return ret
+            self._hotkeys = HotkeyEngine()
+            self._hotkeys.actionTriggered.connect(
+                self._manager.triggerAction, Qt.ConnectionType.QueuedConnection
+            )
+            self._hotkeys.start()
+
+        if options.mpris:
+            from app.mpris import MprisService
+
+            self._mpris = MprisService(self._manager)
+            self._mpris.register()
+
+        if options.history:
+            from app.history import PlayHistory
+
+            self._history = PlayHistory()
+            self._manager.stateChanged.connect(self._history.record)
+            self._miniplayer.setHistory(self._history)
+            self._history.start()
+
+        # Connect mini player signals to workers
+        self._miniplayer.playPauseTriggered.connect(self._manager.requestTogglePlayPause)
+        self._miniplayer.nextTriggered.connect(self._manager.requestNextTrack)
+        self._miniplayer.previousTriggered.connect(self._manager.requestPreviousTrack)
+        self._miniplayer.likeTriggered.connect(self._manager.requestToggleLike)
+        self._miniplayer.dislikeTriggered.connect(self._manager.requestToggleDislike)
+        self._miniplayer.visibilityChanged.connect(self._manager.setUiVisible)
+        self._miniplayer.targetSelected.connect(self._manager.setActiveIndex)
+
+        # Connect active worker signals to miniplayer
+        self._manager.stateChanged.connect(self._miniplayer.applyState)
+        self._manager.activeIndexChanged.connect(self._miniplayer.setActiveTarget)
+
+        # Quit through the event loop, so the state and metrics get saved
+        self._signal_notifier = SignalNotifier()
+        self._signal_notifier.signalReceived.connect(self._handle_signal)
+        self._signal_notifier.watch(signal.SIGINT)
+        self._signal_notifier.watch(signal.SIGTERM)
+        self._metrics = MetricsExporter(
+            options.metrics_file, options.metrics_port, self._signal_notifier
+        )
+
+        self._metrics.start()
+        self._manager.start()
+        mark("workers started")
+        report()
 
-    def _handle_key_press(self, key: Qt.Key):
-        if key == Qt.Key.Key_MediaTogglePlayPause:
-            self._worker.requestTogglePlayPause()
-        elif key == Qt.Key.Key_MediaPlay:
-            self._worker.requestPlay()
-        elif key == Qt.Key.Key_MediaPause:
-            self._worker.requestPause()
-        elif key == Qt.Key.Key_MediaNext:
-            self._worker.requestNextTrack()
-        elif key == Qt.Key.Key_MediaPrevious:
-            self._worker.requestPreviousTrack()
+    def _handle_signal(self, signum: int):
+        if signum in (signal.SIGINT, signal.SIGTERM):
+            self._app.quit()
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+
+from PySide6.QtCore import QStandardPaths
+from PySide6.QtGui import QImage
+
+_logger = logging.getLogger(__name__)
+
+
+def default_cache_dir() -> str:
+    location = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.CacheLocation
+    )
+    return os.path.join(location, "artwork")
+
+
+def _image_bytes(image: QImage) -> int:
+    return image.sizeInBytes()
+
+
+class ArtworkCache:
+    """Two tier artwork cache.
+
+    Decoded, display sized images are kept in a small in-memory LRU, the
+    downloaded image data is kept on disk. Both tiers are bounded by a byte
+    budget and evict the least recently used entries first.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        memory_budget: int = 16 * 1024 * 1024,
+        disk_budget: int = 64 * 1024 * 1024,
+    ):
+        self._directory = directory or default_cache_dir()
+        self._memory_budget = memory_budget
+        self._disk_budget = disk_budget
+
+        self._memory: OrderedDict[str, QImage] = OrderedDict()
+        self._memory_size = 0
+        # File name to size, oldest first
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_size = 0
+
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+
+        self._load_disk_index()
+
+    def directory(self) -> str:
+        return self._directory
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "memory_hits": self._memory_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+        }
+
+    def contains(self, url: str) -> bool:
+        return url in self._memory or self._key(url) in self._disk
+
+    def image(self, url: str) -> QImage | None:
+        """Returns the decoded artwork for the url from memory."""
+        image = self._memory.get(url)
+        if image is not None:
+            self._memory.move_to_end(url)
+            self._memory_hits += 1
+        return image
+
+    def data(self, url: str) -> bytes | None:
+        """Returns the downloaded image data for the url from disk.
+
+        Only call this after a memory miss, a None return counts as a miss.
+        """
+        data = self._read(self._key(url))
+        if data is None:
+            self._misses += 1
+        else:
+            self._disk_hits += 1
+        return data
+
+    def insertImage(self, url: str, image: QImage):
+        if url in self._memory:
+            self._memory_size -= _image_bytes(self._memory.pop(url))
+
+        self._memory[url] = image
+        self._memory_size += _image_bytes(image)
+        while self._memory_size > self._memory_budget and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= _image_bytes(evicted)
+
+    def insertData(self, url: str, data: bytes):
+        self._write(self._key(url), data)
+
+    def remove(self, url: str):
+        image = self._memory.pop(url, None)
+        if image is not None:
+            self._memory_size -= _image_bytes(image)
+        self._remove(self._key(url))
+
+    def clearMemory(self):
+        """Drops the decoded images, e.g. when the display size changes."""
+        self._memory.clear()
+        self._memory_size = 0
+
+    def clear(self):
+        self.clearMemory()
+        for name in list(self._disk):
+            self._remove(name)
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _load_disk_index(self):
+        try:
+            entries = [
+                entry
+                for entry in os.scandir(self._directory)
+                if entry.is_file() and not entry.name.endswith(".tmp")
+            ]
+        except FileNotFoundError:
+            return
+        except OSError as ex:
+            _logger.warning(f"Failed to read artwork cache: {ex}")
+            return
+
+        stats = {entry.name: entry.stat() for entry in entries}
+        for name in sorted(stats, key=lambda name: stats[name].st_mtime):
+            self._disk[name] = stats[name].st_size
+            self._disk_size += stats[name].st_size
+
+    def _read(self, name: str) -> bytes | None:
+        if name not in self._disk:
+            return None
+
+        path = os.path.join(self._directory, name)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # The modification time doubles as the last access time
+            os.utime(path)
+        except OSError:
+            self._forget(name)
+            return None
+
+        self._disk.move_to_end(name)
+        return data
+
+    def _write(self, name: str, data: bytes):
+        path = os.path.join(self._directory, name)
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as file:
+                file.write(data)
+            os.replace(f"{path}.tmp", path)
+        except OSError as ex:
+            _logger.warning(f"Failed to write artwork cache: {ex}")
+            return
+
+        self._forget(name)
+        self._disk[name] = len(data)
+        self._disk_size += len(data)
+        while self._disk_size > self._disk_budget and len(self._disk) > 1:
+            self._remove(next(iter(self._disk)))
+
+    def _remove(self, name: str):
+        try:
+            os.remove(os.path.join(self._directory, name))
+        except OSError:
+            pass
+        self._forget(name)
+
+    def _forget(self, name: str):
+        size = self._disk.pop(name, None)
+        if size is not None:
+            self._disk_size -= size
@@ -0,0 +1,202 @@
+import dataclasses
+import time
+import typing
+
+
+@dataclasses.dataclass(eq=False)
+class Command:
+    """A command sent to the server.
+
+    Commands that change a state field (playing, liked...) carry the value
+    the field is expected to have once the server applied them and the
+    value to roll back to if they fail.
+    """
+
+    endpoint: str
+    field: str | None = None
+    expected: typing.Any = None
+    previous: typing.Any = None
+    sent_at: float = dataclasses.field(default_factory=time.monotonic)
+
+
+class CommandTracker:
+    """Keeps track of in flight commands to reconcile them with server state.
+
+    While a command is pending, server state that disagrees with it is
+    considered stale and ignored, until the server confirms the expected
+    value or the command times out. Replies the server does not resend
+    (unchanged bodies) cannot time commands out, expire them on a timer
+    using nextTimeout.
+    """
+
+    def __init__(self, timeout: float = 5.0):
+        self._timeout = timeout
+        self._pending: dict[str, Command] = {}
+
+    def begin(self, command: Command):
+        if command.field is not None:
+            self._pending[command.field] = command
+
+    def pending(self, field: str) -> Command | None:
+        return self._pending.get(field)
+
+    def nextTimeout(self) -> float | None:
+        """Seconds until the oldest pending command times out."""
+        if not self._pending:
+            return None
+
+        oldest = min(command.sent_at for command in self._pending.values())
+        return max(oldest + self._timeout - time.monotonic(), 0.0)
+
+    def expire(self) -> list[Command]:
+        """Drops and returns the commands the server did not confirm in time."""
+        now = time.monotonic()
+        expired = [
+            command
+            for command in self._pending.values()
+            if now - command.sent_at >= self._timeout
+        ]
+        for command in expired:
+            del self._pending[command.field]
+        return expired
+
+    def reconcile(self, field: str, value: typing.Any) -> bool:
+        """Returns whether a server value for the field should be applied."""
+        command = self._pending.get(field)
+        if command is None:
+            return True
+
+        if value == command.expected:
+            del self._pending[field]
+            return True
+
+        if time.monotonic() - command.sent_at > self._timeout:
+            # The server disagrees for too long, it wins
+            del self._pending[field]
+            return True
+
+        return False
+
+    def resolve(self, command: Command) -> bool:
+        """Marks the command as settled by the server.
+
+        Returns False if a newer command for the same field superseded it.
+        """
+        if command.field is None:
+            return True
+
+        if self._pending.get(command.field) is not command:
+            return False
+
+        del self._pending[command.field]
+        return True
+
+    def cancel(self, field: str):
+        self._pending.pop(field, None)
+
+    def clear(self):
+        self._pending.clear()
+
+
+SKIP_STEPS = {"track/next": 1, "track/prev": -1}
+
+
+class CommandQueue:
+    """Sends commands one at a time per state field and coalesces the rest.
+
+    While a command is in flight, later commands for the same field wait.
+    Skips (next/previous) add up into a single skip count and toggles of
+    the same field cancel each other out before ever reaching the server.
+    """
+
+    def __init__(self, max_skips: int = 10):
+        self._max_skips = max_skips
+        self._in_flight: set[str] = set()
+        self._queued: dict[str, Command] = {}
+        self._skips = 0
+
+        self._sent = 0
+        self._queued_count = 0
+        self._cancelled = 0
+        self._dropped = 0
+        self._max_depth = 0
+
+    @staticmethod
+    def key(command: Command) -> str:
+        if command.field is not None:
+            return command.field
+        if command.endpoint in SKIP_STEPS:
+            return "skip"
+        return command.endpoint
+
+    def depth(self) -> int:
+        return len(self._queued) + abs(self._skips)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "sent": self._sent,
+            "queued": self._queued_count,
+            "cancelled": self._cancelled,
+            "dropped": self._dropped,
+            "depth": self.depth(),
+            "max_depth": self._max_depth,
+        }
+
+    def submit(self, command: Command) -> Command | None:
+        """Returns the command if it can be sent now, otherwise queues it."""
+        key = self.key(command)
+        if key not in self._in_flight:
+            self._in_flight.add(key)
+            self._sent += 1
+            return command
+
+        if key == "skip":
+            skips = self._skips + SKIP_STEPS[command.endpoint]
+            if abs(skips) > self._max_skips:
+                self._dropped += 1
+            elif abs(skips) < abs(self._skips):
+                # Next and previous cancel each other out
+                self._cancelled += 1
+                self._skips = skips
+            else:
+                self._queued_count += 1
+                self._skips = skips
+        elif key in self._queued:
+            queued = self._queued[key]
+            if queued.expected == command.expected:
+                self._dropped += 1
+            else:
+                # Toggling back restores what is in flight
+                del self._queued[key]
+                self._cancelled += 1
+        else:
+            self._queued[key] = command
+            self._queued_count += 1
+
+        self._max_depth = max(self._max_depth, self.depth())
+        return None
+
+    def complete(self, command: Command) -> Command | None:
+        """Marks the command as done, returns the next one to send if any."""
+        key = self.key(command)
+        if key == "skip" and self._skips:
+            endpoint = "track/next" if self._skips > 0 else "track/prev"
+            self._skips -= SKIP_STEPS[endpoint]
+            self._sent += 1
+            return Command(endpoint)
+
+        queued = self._queued.pop(key, None)
+        if queued is None:
+            self._in_flight.discard(key)
+        else:
+            self._sent += 1
+        return queued
+
+    def discard(self, command: Command):
+        """Drops whatever is queued behind the command."""
+        key = self.key(command)
+        if key == "skip":
+            self._dropped += abs(self._skips)
+            self._skips = 0
+        elif self._queued.pop(key, None) is not None:
+            self._dropped += 1
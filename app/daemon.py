@@ -0,0 +1,233 @@
+import json
+import logging
+import signal
+import sys
+import time
+import typing
+
+from PySide6.QtCore import QCoreApplication, QObject, Qt, QTimer
+from PySide6.QtNetwork import QLocalServer, QLocalSocket
+
+from app.metrics import MetricsExporter
+from app.options import parse_options
+from app.playerstate import PlayerSnapshot
+from app.startupprofile import mark, report
+from app.signalnotifier import SignalNotifier
+from app.snapshotstore import SnapshotStore
+from app.workermanager import ACTIONS, WorkerManager
+
+_logger = logging.getLogger(__name__)
+
+
+class ControlServer(QObject):
+    """Local socket exposing the active worker to other processes.
+
+    Clients write one command per line, either as a bare word ("next") or
+    as JSON ({"command": "next"}), and receive newline delimited JSON
+    events: the full state on connect and on "state", then only the fields
+    that changed.
+    """
+
+    def __init__(self, manager: WorkerManager, name: str, parent=None):
+        super().__init__(parent)
+        self._manager = manager
+        self._name = name
+        self._clients: list[QLocalSocket] = []
+
+        self._server = QLocalServer(self)
+        self._server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        self._server.newConnection.connect(self._handle_new_connection)
+
+        manager.stateChanged.connect(self._handle_state_changed)
+        manager.activeIndexChanged.connect(lambda index: self._broadcast_state())
+        manager.commandFailed.connect(self._handle_command_failed)
+
+    def listen(self) -> bool:
+        # Clean up after a previous instance that did not shut down cleanly
+        QLocalServer.removeServer(self._name)
+        if not self._server.listen(self._name):
+            _logger.error(
+                f"Failed to listen on {self._name}: {self._server.errorString()}"
+            )
+            return False
+
+        _logger.info(f"Listening on {self._server.fullServerName()}")
+        return True
+
+    def close(self):
+        self._server.close()
+        for client in self._clients:
+            client.disconnectFromServer()
+
+    def state(self) -> dict[str, typing.Any]:
+        snapshot = self._manager.snapshot()
+        return {
+            "server": self._manager.activeWorker().server(),
+            "title": snapshot.title,
+            "artist": snapshot.artist,
+            "playing": snapshot.playing,
+            "liked": snapshot.liked,
+            "disliked": snapshot.disliked,
+            "duration": snapshot.duration,
+            "position": snapshot.positionAt(time.monotonic()),
+            "stale": snapshot.stale,
+        }
+
+    def _handle_new_connection(self):
+        while self._server.hasPendingConnections():
+            client = self._server.nextPendingConnection()
+            client.readyRead.connect(
+                lambda client=client: self._handle_ready_read(client)
+            )
+            client.disconnected.connect(
+                lambda client=client: self._handle_disconnected(client)
+            )
+            self._clients.append(client)
+            self._send(client, {"event": "state", **self.state()})
+        # Connected clients are displaying the state, poll at full rate
+        self._manager.setUiVisible(bool(self._clients))
+
+    def _handle_disconnected(self, client: QLocalSocket):
+        if client in self._clients:
+            self._clients.remove(client)
+        client.deleteLater()
+        self._manager.setUiVisible(bool(self._clients))
+
+    def _handle_ready_read(self, client: QLocalSocket):
+        while client.canReadLine():
+            line = client.readLine().data().decode(errors="replace").strip()
+            if line:
+                self._handle_command(client, line)
+
+    def _handle_command(self, client: QLocalSocket, line: str):
+        command: typing.Any = line
+        if line.startswith("{"):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                self._send(client, {"event": "error", "message": "Invalid JSON"})
+                return
+            command = data.get("command", "") if isinstance(data, dict) else data
+
+        if command == "state":
+            self._send(client, {"event": "state", **self.state()})
+        # Any JSON value may be sent, only strings are looked up
+        elif isinstance(command, str) and command in ACTIONS:
+            self._manager.triggerAction(command)
+        else:
+            self._send(
+                client, {"event": "error", "message": f"Unknown command: {command}"}
+            )
+
+    def _handle_state_changed(self, snapshot: PlayerSnapshot, changed: frozenset[str]):
+        # One event per coalesced update, artwork is not sent over the socket
+        fields = {field: getattr(snapshot, field) for field in changed}
+        fields.pop("artwork", None)
+        if fields:
+            self._broadcast(**fields)
+
+    def _handle_command_failed(self, endpoint: str, error: str):
+        self._broadcast_event(
+            {"event": "error", "command": endpoint, "message": error}
+        )
+
+    def _broadcast(self, **fields):
+        self._broadcast_event({"event": "changed", **fields})
+
+    def _broadcast_state(self):
+        self._broadcast_event({"event": "state", **self.state()})
+
+    def _broadcast_event(self, event: dict[str, typing.Any]):
+        if not self._clients:
+            return
+
+        line = json.dumps(event).encode() + b"\n"
+        for client in self._clients:
+            client.write(line)
+
+    @staticmethod
+    def _send(client: QLocalSocket, event: dict[str, typing.Any]):
+        client.write(json.dumps(event).encode() + b"\n")
+
+
+class HeadlessApplication:
+    """Runs the workers without any widgets, see ControlServer."""
+
+    def __init__(self):
+        self._app = QCoreApplication(sys.argv)
+        options = parse_options(self._app)
+        mark("options parsed")
+
+        self._manager = WorkerManager(
+            options.servers,
+            realtime=options.realtime,
+            poll_policy=options.poll_policy,
+            fetch_artwork=False,
+            snapshot_store=SnapshotStore(),
+        )
+        self._control_server = ControlServer(self._manager, options.socket_name)
+
+        self._hotkeys = None
+        if options.listen:
+            from app.hotkeys import HotkeyEngine
+
+            self._hotkeys = HotkeyEngine()
+            self._hotkeys.actionTriggered.connect(
+                self._manager.triggerAction, Qt.ConnectionType.QueuedConnection
+            )
+            self._hotkeys.start()
+
+        self._mpris = None
+        if options.mpris:
+            from app.mpris import MprisService
+
+            self._mpris = MprisService(self._manager)
+
+        self._history = None
+        if options.history:
+            from app.history import PlayHistory
+
+            self._history = PlayHistory()
+            self._manager.stateChanged.connect(self._history.record)
+
+        self._signal_notifier = SignalNotifier()
+        self._signal_notifier.signalReceived.connect(self._handle_signal)
+        self._signal_notifier.watch(signal.SIGINT)
+        self._signal_notifier.watch(signal.SIGTERM)
+        self._metrics = MetricsExporter(
+            options.metrics_file, options.metrics_port, self._signal_notifier
+        )
+
+    def exec(self):
+        if not self._control_server.listen():
+            return 1
+
+        if self._mpris:
+            self._mpris.register()
+        if self._history:
+            self._history.start()
+        self._metrics.start()
+        self._manager.start()
+        mark("workers started")
+        QTimer.singleShot(0, self._handle_started)
+        ret = self._app.exec()
+        # Disconnecting clients still reaches the workers
+        self._control_server.close()
+        self._manager.stop()
+        if self._hotkeys:
+            self._hotkeys.stop()
+        if self._mpris:
+            self._mpris.unregister()
+        if self._history:
+            self._history.stop()
+        self._metrics.dump()
+
+        return ret
+
+    def _handle_started(self):
+        mark("event loop running")
+        report()
+
+    def _handle_signal(self, signum: int):
+        if signum in (signal.SIGINT, signal.SIGTERM):
+            self._app.quit()
@@ -0,0 +1,409 @@
+import dataclasses
+import functools
+import logging
+import os
+import sqlite3
+import time
+import typing
+
+from PySide6.QtCore import (
+    QMetaObject,
+    QObject,
+    QStandardPaths,
+    Qt,
+    QThread,
+    QTimer,
+    Signal,
+    Slot,
+)
+
+from app.metrics import registry
+from app.playerstate import PlayerSnapshot
+
+_logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+# Plays are kept for a year, liked tracks until they are unliked
+RETENTION_DAYS = 365
+# Pending plays are written at most this long after they ended (ms), or
+# as soon as BATCH_SIZE of them are pending
+FLUSH_INTERVAL = 60_000
+BATCH_SIZE = 32
+# Retention and compaction run on open and then once a day (ms)
+MAINTENANCE_INTERVAL = 24 * 60 * 60 * 1000
+# Tracks skipped before playing this long (seconds) are not recorded
+MIN_PLAYED = 10.0
+QUERY_LIMIT = 20
+WEEK = 7 * 24 * 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    artist TEXT NOT NULL,
+    liked_at REAL,
+    UNIQUE (title, artist)
+);
+CREATE TABLE IF NOT EXISTS plays (
+    id INTEGER PRIMARY KEY,
+    track_id INTEGER NOT NULL REFERENCES tracks (id),
+    started REAL NOT NULL,
+    stopped REAL NOT NULL,
+    played REAL NOT NULL,
+    liked INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plays_started ON plays (started, track_id);
+CREATE INDEX IF NOT EXISTS plays_track ON plays (track_id);
+CREATE INDEX IF NOT EXISTS tracks_liked ON tracks (liked_at)
+    WHERE liked_at IS NOT NULL;
+"""
+
+# A like is kept from the first play it was seen in, unliking clears it
+UPSERT_TRACK = """
+INSERT INTO tracks (title, artist, liked_at) VALUES (?, ?, ?)
+ON CONFLICT (title, artist) DO UPDATE SET liked_at = CASE
+    WHEN excluded.liked_at IS NULL THEN NULL
+    ELSE coalesce(tracks.liked_at, excluded.liked_at)
+END
+RETURNING id
+"""
+
+INSERT_PLAY = """
+INSERT INTO plays (track_id, started, stopped, played, liked)
+VALUES (?, ?, ?, ?, ?)
+"""
+
+# Query names mapped to their SQL, taking the current time and a limit.
+# Rows are title, artist, number of plays and a time.
+QUERIES = {
+    "most_played": f"""
+        SELECT title, artist, count(*) AS plays, max(started)
+        FROM plays JOIN tracks ON tracks.id = plays.track_id
+        WHERE started >= :now - {WEEK}
+        GROUP BY track_id
+        ORDER BY plays DESC, max(started) DESC
+        LIMIT :limit
+    """,
+    "recently_liked": """
+        SELECT title, artist,
+            (SELECT count(*) FROM plays WHERE track_id = tracks.id), liked_at
+        FROM tracks
+        WHERE liked_at IS NOT NULL
+        ORDER BY liked_at DESC
+        LIMIT :limit
+    """,
+}
+
+
+def default_history_path() -> str:
+    location = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.AppLocalDataLocation
+    )
+    return os.path.join(location, "history.sqlite3")
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Play:
+    """A finished play, times from time.time()."""
+
+    title: str
+    artist: str
+    started: float
+    stopped: float
+    # Seconds spent playing, pauses excluded
+    played: float
+    liked_at: float | None = None
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class HistoryEntry:
+    title: str
+    artist: str
+    plays: int
+    # Last played or liked, depending on the query
+    time: float
+
+
+@dataclasses.dataclass(slots=True)
+class _CurrentPlay:
+    title: str
+    artist: str
+    started: float
+    liked_at: float | None
+    played: float = 0.0
+    playing_since: float | None = None
+
+    def setPlaying(self, playing: bool, now: float):
+        if playing and self.playing_since is None:
+            self.playing_since = now
+        elif not playing and self.playing_since is not None:
+            self.played += now - self.playing_since
+            self.playing_since = None
+
+    def finish(self, now: float) -> Play:
+        self.setPlaying(False, now)
+        return Play(
+            self.title, self.artist, self.started, now, self.played, self.liked_at
+        )
+
+
+class _HistoryWriter(QObject):
+    """Owns the database connection, lives on the history thread."""
+
+    queryFinished = Signal(str, object)
+
+    def __init__(self, path: str, retention_days: int, parent=None):
+        super().__init__(parent)
+        self._path = path
+        self._retention_days = retention_days
+        self._connection: sqlite3.Connection | None = None
+        self._maintenance_timer: QTimer | None = None
+
+        # Only written on the history thread
+        self._written = 0
+        self._batches = 0
+        self._failures = 0
+        self._write_time = 0.0
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "plays_written": self._written,
+            "batches": self._batches,
+            "failures": self._failures,
+            "write_seconds": self._write_time,
+        }
+
+    @Slot()
+    def open(self):
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self._path, isolation_level=None)
+            # Incremental vacuum only applies to a database created with it
+            connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            connection.execute("PRAGMA journal_mode = WAL")
+            # WAL stays consistent with NORMAL, a crash loses the last batch
+            connection.execute("PRAGMA synchronous = NORMAL")
+            connection.execute("PRAGMA journal_size_limit = 1048576")
+            connection.executescript(
+                f"BEGIN; {SCHEMA} PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;"
+            )
+        except (OSError, sqlite3.Error) as ex:
+            _logger.warning("Failed to open play history %s: %s", self._path, ex)
+            return
+
+        self._connection = connection
+        _logger.info("Recording play history to %s", self._path)
+
+        self._maintenance_timer = QTimer(self, interval=MAINTENANCE_INTERVAL)
+        self._maintenance_timer.timeout.connect(self.maintain)
+        self._maintenance_timer.start()
+        self.maintain()
+
+    @Slot()
+    def close(self):
+        if self._maintenance_timer is not None:
+            self._maintenance_timer.stop()
+        if self._connection is None:
+            return
+
+        try:
+            self._connection.execute("PRAGMA optimize")
+            self._connection.close()
+        except sqlite3.Error as ex:
+            _logger.warning("Failed to close the play history: %s", ex)
+        self._connection = None
+
+    def write(self, plays: list[Play]):
+        """Appends a batch of plays in one transaction."""
+        if self._connection is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            with self._connection as connection:
+                connection.execute("BEGIN")
+                for play in plays:
+                    (track_id,) = connection.execute(
+                        UPSERT_TRACK, (play.title, play.artist, play.liked_at)
+                    ).fetchone()
+                    connection.execute(
+                        INSERT_PLAY,
+                        (
+                            track_id,
+                            play.started,
+                            play.stopped,
+                            play.played,
+                            play.liked_at is not None,
+                        ),
+                    )
+        except sqlite3.Error as ex:
+            self._failures += 1
+            _logger.warning("Failed to write %d plays to history: %s", len(plays), ex)
+            return
+        finally:
+            self._write_time += time.perf_counter() - start
+
+        self._written += len(plays)
+        self._batches += 1
+        _logger.debug("Wrote %s plays to history", len(plays))
+
+    def query(self, name: str, limit: int):
+        entries: list[HistoryEntry] = []
+        if self._connection is not None:
+            try:
+                rows = self._connection.execute(
+                    QUERIES[name], {"now": time.time(), "limit": limit}
+                )
+                entries = [HistoryEntry(*row) for row in rows]
+            except sqlite3.Error as ex:
+                _logger.warning("Failed to query history: %s", ex)
+        self.queryFinished.emit(name, entries)
+
+    @Slot()
+    def maintain(self):
+        """Drops expired plays and gives the freed pages back to the disk."""
+        if self._connection is None:
+            return
+
+        cutoff = time.time() - self._retention_days * 24 * 60 * 60
+        try:
+            with self._connection as connection:
+                connection.execute("BEGIN")
+                plays = connection.execute(
+                    "DELETE FROM plays WHERE started < ?", (cutoff,)
+                ).rowcount
+                tracks = connection.execute(
+                    "DELETE FROM tracks WHERE liked_at IS NULL AND NOT EXISTS "
+                    "(SELECT 1 FROM plays WHERE track_id = tracks.id)"
+                ).rowcount
+            if plays or tracks:
+                _logger.info(
+                    "Removed %d plays and %d tracks from history", plays, tracks
+                )
+                # Frees one page per step, execute() would only run one
+                connection.executescript("PRAGMA incremental_vacuum;")
+            # Also keeps the WAL file from growing between restarts
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            connection.execute("PRAGMA optimize")
+        except sqlite3.Error as ex:
+            _logger.warning("Failed to compact history: %s", ex)
+
+
+class PlayHistory(QObject):
+    """Records what the active worker plays in a local SQLite database.
+
+    Plays are assembled from the snapshots the manager relays, on the GUI
+    thread, which only appends them to a list. The list is written in
+    batches, in one transaction each, by a connection in WAL mode on a
+    thread of its own, so neither polling nor painting ever waits for the
+    disk. Queries run on that thread too, results arrive as queryFinished.
+
+    Plays older than the retention are removed daily, and tracks no longer
+    played or liked with them, so the indexed queries stay fast. Pending
+    plays are written on stop, a crash loses at most one batch.
+    """
+
+    queryFinished = Signal(str, object)
+
+    def __init__(
+        self,
+        path: str | None = None,
+        retention_days: int = RETENTION_DAYS,
+        flush_interval: int = FLUSH_INTERVAL,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._path = path or default_history_path()
+        self._thread = QThread(objectName="PlayHistory")
+        self._writer = _HistoryWriter(self._path, retention_days)
+        self._writer.moveToThread(self._thread)
+        self._writer.queryFinished.connect(self.queryFinished)
+        self._thread.finished.connect(self._writer.deleteLater)
+        registry.addCollector("ytmdr_history", self._writer.stats)
+
+        self._current: _CurrentPlay | None = None
+        self._pending: list[Play] = []
+        self._flush_timer = QTimer(self, interval=flush_interval, singleShot=True)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def path(self) -> str:
+        return self._path
+
+    def start(self):
+        self._thread.start()
+        self._invoke(self._writer.open)
+
+    def stop(self):
+        """Ends the current play, writes what is pending and waits."""
+        if not self._thread.isRunning():
+            return
+
+        if self._current is not None:
+            self._finish(self._current.finish(time.time()))
+            self._current = None
+        self.flush()
+        QMetaObject.invokeMethod(
+            self._writer, "close", Qt.ConnectionType.BlockingQueuedConnection
+        )
+        self._thread.quit()
+        self._thread.wait()
+
+    @Slot()
+    def flush(self):
+        self._flush_timer.stop()
+        if not self._pending:
+            return
+
+        self._invoke(self._writer.write, self._pending)
+        self._pending = []
+
+    def requestQuery(self, name: str, limit: int = QUERY_LIMIT):
+        """Queries one of QUERIES, answered with queryFinished."""
+        if name not in QUERIES:
+            raise ValueError(f"Unknown history query: {name}")
+
+        # Include what is still pending
+        self.flush()
+        self._invoke(self._writer.query, name, limit)
+
+    @Slot(object, object)
+    def record(self, snapshot: PlayerSnapshot, changed: frozenset[str]):
+        """Follows the state of the active worker, see WorkerManager."""
+        # Restored from the last session, the play starts once synced
+        if snapshot.stale:
+            return
+
+        now = time.time()
+        current = self._current
+        if changed & {"title", "artist", "stale"}:
+            if current is not None:
+                self._finish(current.finish(now))
+            current = None
+            if snapshot.title:
+                current = _CurrentPlay(
+                    snapshot.title,
+                    snapshot.artist,
+                    now,
+                    now if snapshot.liked else None,
+                )
+            self._current = current
+        elif current is not None and "liked" in changed:
+            current.liked_at = now if snapshot.liked else None
+
+        if current is not None:
+            current.setPlaying(snapshot.playing, now)
+
+    def _finish(self, play: Play):
+        if play.played < MIN_PLAYED:
+            return
+
+        self._pending.append(play)
+        if len(self._pending) >= BATCH_SIZE:
+            self.flush()
+        elif not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    @staticmethod
+    def _invoke(method: typing.Callable[..., typing.Any], *args):
+        """Queues a call to a writer method on the history thread."""
+        QTimer.singleShot(0, method.__self__, functools.partial(method, *args))
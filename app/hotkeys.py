@@ -0,0 +1,506 @@
+"""Global hotkeys mapped to player actions.
+
+Bindings are read from the "hotkeys" settings group, one entry per action
+(see workermanager.ACTIONS) holding key sequences in portable text, several
+separated by "; ", e.g. "like=Ctrl+Alt+L". An empty entry unbinds an action.
+"hotkeys/backend" picks how keys are captured (auto, xgrab, pynput or none)
+and "hotkeys/debounce" the window in which a key's contacts bounce (ms).
+
+Backends call back on their own thread. Repeats and bounces are dropped
+there, only accepted actions are emitted to the Qt side.
+"""
+
+import logging
+import os
+import select
+import sys
+import threading
+import time
+import typing
+
+from PySide6.QtCore import QKeyCombination, QObject, QSettings, Qt, Signal
+from PySide6.QtGui import QKeySequence
+
+_logger = logging.getLogger(__name__)
+
+SETTINGS_GROUP = "hotkeys"
+DEFAULT_BINDINGS = {
+    "toggle": "Toggle Media Play/Pause",
+    # X11 has one keysym for both Play keys, bound to toggle above
+    "play": "",
+    "pause": "Media Pause; Media Stop",
+    "next": "Media Next",
+    "previous": "Media Previous",
+    "like": "",
+    "dislike": "",
+}
+DEFAULT_BACKEND = "auto"
+# Presses of a released key closer together than this are contact bounce
+# (ms), held keys are told apart by their releases
+DEFAULT_DEBOUNCE = 30
+
+# A held key that was not pressed again for this long missed its release,
+# autorepeat presses come every few dozen ms (s)
+REPEAT_TIMEOUT = 1.0
+
+# A key and its modifiers, as in QKeyCombination.toCombined()
+Hotkey = int
+
+_MODIFIERS = (
+    Qt.KeyboardModifier.ShiftModifier
+    | Qt.KeyboardModifier.ControlModifier
+    | Qt.KeyboardModifier.AltModifier
+    | Qt.KeyboardModifier.MetaModifier
+)
+
+
+def hotkey(key: Qt.Key, modifiers=Qt.KeyboardModifier.NoModifier) -> Hotkey:
+    return QKeyCombination(modifiers, key).toCombined()
+
+
+def load_bindings(settings: QSettings | None = None) -> dict[Hotkey, str]:
+    """Reads the binding table, hotkeys mapped to action names."""
+    settings = settings or QSettings()
+    settings.beginGroup(SETTINGS_GROUP)
+    bindings = {}
+    for action, default in DEFAULT_BINDINGS.items():
+        value = str(settings.value(action, default))
+        for sequence in QKeySequence.listFromString(value):
+            if sequence.isEmpty():
+                continue
+            combination = sequence[0]
+            if sequence.count() != 1 or combination.key() == Qt.Key.Key_unknown:
+                _logger.warning(f"Ignoring invalid hotkey for {action}: {value}")
+                continue
+            bindings[combination.toCombined()] = action
+    settings.endGroup()
+    return bindings
+
+
+class KeyFilter:
+    """Drops repeated and bouncing presses.
+
+    A press is a repeat while the key was not released since the last one,
+    unless that was long ago and the release got lost. Presses closer than
+    debounce seconds to the last accepted press (or repeat) of the same key
+    are contact bounce. Quick deliberate presses, released in between, all
+    get through. Not thread-safe, it is only used on the backend's thread.
+    """
+
+    def __init__(self, debounce: float):
+        self._debounce = debounce
+        self._held: set[Hotkey] = set()
+        self._pressed_at: dict[Hotkey, float] = {}
+
+    def press(self, key: Hotkey, now: float | None = None) -> bool:
+        """Returns whether the press should trigger its action."""
+        if now is None:
+            now = time.monotonic()
+
+        previous = self._pressed_at.get(key)
+        elapsed = now - previous if previous is not None else None
+        if key in self._held and elapsed is not None and elapsed < REPEAT_TIMEOUT:
+            # Still held, keeps the repeat timeout from expiring
+            self._pressed_at[key] = now
+            return False
+
+        self._held.add(key)
+        if elapsed is not None and elapsed < self._debounce:
+            return False
+        self._pressed_at[key] = now
+        return True
+
+    def release(self, key: Hotkey):
+        self._held.discard(key)
+
+
+class HotkeyBackend:
+    """Captures the bound hotkeys, calling back on its own thread."""
+
+    name = ""
+
+    def __init__(
+        self,
+        hotkeys: typing.Collection[Hotkey],
+        on_press: typing.Callable[[Hotkey], None],
+        on_release: typing.Callable[[Hotkey], None],
+    ):
+        self._hotkeys = hotkeys
+        self._on_press = on_press
+        self._on_release = on_release
+
+    @staticmethod
+    def available() -> bool:
+        return True
+
+    def start(self) -> bool:
+        return True
+
+    def stop(self):
+        pass
+
+
+class NullBackend(HotkeyBackend):
+    """Captures nothing, e.g. where MPRIS delivers the media keys."""
+
+    name = "none"
+
+    def start(self) -> bool:
+        return False
+
+
+class PynputBackend(HotkeyBackend):
+    """Hooks the whole keyboard with pynput, works on every platform.
+
+    Every key stroke on the system goes through the hook, only presses of
+    bound hotkeys are passed on.
+    """
+
+    name = "pynput"
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._listener = None
+        self._modifiers = Qt.KeyboardModifier.NoModifier
+
+    @staticmethod
+    def available() -> bool:
+        try:
+            from pynput import keyboard  # noqa: F401
+        except Exception:
+            # pynput raises more than ImportError without a usable display
+            return False
+        return True
+
+    def start(self) -> bool:
+        from pynput import keyboard
+
+        self._keyboard = keyboard
+        self._key_map = {
+            keyboard.Key.media_play_pause: Qt.Key.Key_MediaTogglePlayPause,
+            keyboard.Key.media_next: Qt.Key.Key_MediaNext,
+            keyboard.Key.media_previous: Qt.Key.Key_MediaPrevious,
+            keyboard.Key.space: Qt.Key.Key_Space,
+            **{
+                getattr(keyboard.Key, f"f{i}"): Qt.Key(Qt.Key.Key_F1.value + i - 1)
+                for i in range(1, 21)
+                if hasattr(keyboard.Key, f"f{i}")
+            },
+        }
+        self._modifier_map = {
+            keyboard.Key.shift: Qt.KeyboardModifier.ShiftModifier,
+            keyboard.Key.ctrl: Qt.KeyboardModifier.ControlModifier,
+            keyboard.Key.alt: Qt.KeyboardModifier.AltModifier,
+            keyboard.Key.cmd: Qt.KeyboardModifier.MetaModifier,
+        }
+        self._listener = keyboard.Listener(
+            on_press=self._handle_press, on_release=self._handle_release
+        )
+        self._listener.start()
+        return True
+
+    def stop(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener.join()
+            self._listener = None
+
+    def _hotkey(self, key) -> Hotkey | None:
+        if isinstance(key, self._keyboard.KeyCode):
+            char = key.char
+            if not char and key.vk is not None and key.vk < 0x80:
+                # Some layouts give no character with modifiers held, the
+                # virtual key (X keysym, Windows VK) is the ASCII one then
+                char = chr(key.vk)
+                if not char.isalnum():
+                    return None
+            if not char or len(char) != 1 or not char.isascii():
+                return None
+            if ord(char) < 0x20:
+                # Control held turns letters into control codes, Ctrl+L is \x0c
+                char = chr(ord(char) + 0x40)
+            if not char.isprintable():
+                return None
+            return hotkey(Qt.Key(ord(char.upper())), self._modifiers)
+
+        qt_key = self._key_map.get(key)
+        if qt_key is None:
+            return None
+        return hotkey(qt_key, self._modifiers)
+
+    def _handle_press(self, key):
+        key = self._listener.canonical(key)
+        modifier = self._modifier_map.get(key)
+        if modifier is not None:
+            self._modifiers |= modifier
+            return
+
+        combined = self._hotkey(key)
+        if combined in self._hotkeys:
+            self._on_press(combined)
+
+    def _handle_release(self, key):
+        key = self._listener.canonical(key)
+        modifier = self._modifier_map.get(key)
+        if modifier is not None:
+            self._modifiers &= ~modifier
+            return
+
+        # Modifiers may have changed since the press, release every variant
+        combined = self._hotkey(key)
+        if combined is not None:
+            key_only = combined & ~_MODIFIERS.value
+            for bound in self._hotkeys:
+                if bound & ~_MODIFIERS.value == key_only:
+                    self._on_release(bound)
+
+
+# Keysyms of the keys that do not match their character code
+_X_KEYSYMS = {
+    Qt.Key.Key_MediaTogglePlayPause: 0x1008FF14,
+    Qt.Key.Key_MediaPlay: 0x1008FF14,
+    Qt.Key.Key_MediaPause: 0x1008FF31,
+    Qt.Key.Key_MediaStop: 0x1008FF15,
+    Qt.Key.Key_MediaPrevious: 0x1008FF16,
+    Qt.Key.Key_MediaNext: 0x1008FF17,
+    Qt.Key.Key_Space: 0x20,
+    **{Qt.Key(Qt.Key.Key_F1.value + i): 0xFFBE + i for i in range(24)},
+}
+
+
+class XGrabBackend(HotkeyBackend):
+    """Passively grabs only the bound keys on the X11 root window.
+
+    The X server delivers nothing but the grabbed combinations, other key
+    strokes never reach the process. Grabs fail for keys another client
+    grabbed first, those are logged and skipped, as are hotkeys that are
+    the same X key as one earlier in the collection.
+    """
+
+    name = "xgrab"
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._thread: threading.Thread | None = None
+        # Read end and write end, while running
+        self._wakeup: tuple[int, int] | None = None
+        self._stopping = False
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux") or not os.environ.get("DISPLAY"):
+            return False
+        try:
+            import Xlib.display  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def start(self) -> bool:
+        from Xlib import display, error
+
+        try:
+            self._display = display.Display()
+        except error.DisplayError as ex:
+            _logger.warning(f"Failed to open the X display: {ex}")
+            return False
+
+        self._grabs = self._grab()
+        self._wakeup = os.pipe()
+        self._stopping = False
+        self._thread = threading.Thread(
+            target=self._run, name="XGrabBackend", daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        self._stopping = True
+        os.write(self._wakeup[1], b"\0")
+        self._thread.join()
+        self._thread = None
+        for fd in self._wakeup:
+            os.close(fd)
+        self._wakeup = None
+
+    def _grab(self) -> dict[tuple[int, int], Hotkey]:
+        from Xlib import X, error
+
+        modifier_masks = {
+            Qt.KeyboardModifier.ShiftModifier: X.ShiftMask,
+            Qt.KeyboardModifier.ControlModifier: X.ControlMask,
+            Qt.KeyboardModifier.AltModifier: X.Mod1Mask,
+            Qt.KeyboardModifier.MetaModifier: X.Mod4Mask,
+        }
+        root = self._display.screen().root
+        grabs = {}
+        for combined in self._hotkeys:
+            combination = QKeyCombination.fromCombined(combined)
+            key = combination.key()
+            keysym = _X_KEYSYMS.get(key)
+            if keysym is None and key.value < 0x80:
+                keysym = ord(chr(key.value).lower())
+            keycode = self._display.keysym_to_keycode(keysym) if keysym else 0
+            if not keycode:
+                _logger.warning(f"No X key for {QKeySequence(combined).toString()}")
+                continue
+
+            mask = 0
+            for modifier, modifier_mask in modifier_masks.items():
+                if combination.keyboardModifiers() & modifier:
+                    mask |= modifier_mask
+            # Distinct Qt keys can share a keysym, the first binding wins
+            if (keycode, mask) in grabs:
+                _logger.warning(
+                    f"{QKeySequence(combined).toString()} is the same X key as "
+                    f"{QKeySequence(grabs[(keycode, mask)]).toString()}, ignoring it"
+                )
+                continue
+            # Caps Lock and Num Lock must not disable the hotkey
+            catcher = error.CatchError(error.BadAccess)
+            for extra in (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask):
+                root.grab_key(
+                    keycode,
+                    mask | extra,
+                    True,
+                    X.GrabModeAsync,
+                    X.GrabModeAsync,
+                    onerror=catcher,
+                )
+            self._display.sync()
+            if catcher.get_error():
+                _logger.warning(
+                    f"{QKeySequence(combined).toString()} is grabbed by another "
+                    "application"
+                )
+                continue
+            grabs[(keycode, mask)] = combined
+        return grabs
+
+    def _run(self):
+        from Xlib import X
+
+        relevant = X.ShiftMask | X.ControlMask | X.Mod1Mask | X.Mod4Mask
+        try:
+            pending = None
+            while not self._stopping:
+                if pending is None and not self._display.pending_events():
+                    select.select([self._display, self._wakeup[0]], [], [])
+                    continue
+
+                if pending is not None:
+                    event, pending = pending, None
+                else:
+                    event = self._display.next_event()
+                if event.type not in (X.KeyPress, X.KeyRelease):
+                    continue
+
+                if event.type == X.KeyPress:
+                    combined = self._grabs.get((event.detail, event.state & relevant))
+                    if combined is not None:
+                        self._on_press(combined)
+                else:
+                    # Autorepeat sends a release and a press with the same
+                    # time, the key stays held through both
+                    if self._display.pending_events():
+                        pending = self._display.next_event()
+                        if (
+                            pending.type == X.KeyPress
+                            and pending.detail == event.detail
+                            and pending.time == event.time
+                        ):
+                            pending = None
+                            continue
+                    # Modifiers may have been released first
+                    for (keycode, _), combined in self._grabs.items():
+                        if keycode == event.detail:
+                            self._on_release(combined)
+        except Exception as ex:
+            _logger.exception(ex)
+        finally:
+            self._display.screen().root.ungrab_key(X.AnyKey, X.AnyModifier)
+            self._display.close()
+
+
+BACKENDS: dict[str, type[HotkeyBackend]] = {
+    "xgrab": XGrabBackend,
+    "pynput": PynputBackend,
+    "none": NullBackend,
+}
+
+
+def backend_class(name: str) -> type[HotkeyBackend]:
+    """Resolves "auto" to the least intrusive backend available."""
+    if name != "auto":
+        backend = BACKENDS.get(name)
+        if backend is None:
+            _logger.warning(f"Unknown hotkey backend {name}, using auto")
+        elif backend.available():
+            return backend
+        else:
+            _logger.warning(f"Hotkey backend {name} is not available, using auto")
+
+    for backend in (XGrabBackend, PynputBackend):
+        if backend.available():
+            return backend
+    _logger.warning("No hotkey backend is available, hotkeys are disabled")
+    return NullBackend
+
+
+class HotkeyEngine(QObject):
+    """Emits actionTriggered for the bound hotkeys, see the module docs.
+
+    actionTriggered is emitted on the backend's thread, connected slots run
+    queued on their own.
+    """
+
+    actionTriggered = Signal(str)
+
+    def __init__(
+        self,
+        bindings: dict[Hotkey, str] | None = None,
+        backend: str | None = None,
+        debounce: int | None = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        settings = QSettings()
+        settings.beginGroup(SETTINGS_GROUP)
+        if backend is None:
+            backend = str(settings.value("backend", DEFAULT_BACKEND))
+        if debounce is None:
+            debounce = int(settings.value("debounce", DEFAULT_DEBOUNCE))
+        settings.endGroup()
+
+        self._bindings = load_bindings() if bindings is None else bindings
+        self._filter = KeyFilter(debounce / 1000)
+        backend_type = backend_class(backend)
+        self._backend = backend_type(
+            # In binding table order, earlier bindings win conflicts
+            tuple(self._bindings), self._handle_press, self._filter.release
+        )
+
+    def backendName(self) -> str:
+        return self._backend.name
+
+    def start(self):
+        if not self._bindings:
+            return
+
+        if self._backend.start():
+            _logger.info(
+                f"Listening for {len(self._bindings)} hotkeys "
+                f"with the {self._backend.name} backend"
+            )
+
+    def stop(self):
+        self._backend.stop()
+
+    def _handle_press(self, key: Hotkey):
+        if self._filter.press(key):
+            self.actionTriggered.emit(self._bindings[key])
+        else:
+            _logger.debug("Dropped repeated %s", QKeySequence(key).toString())
@@ -0,0 +1,116 @@
+import logging
+
+import qtawesome as qta  # type: ignore
+from PySide6.QtCore import QEvent, QObject, QRect, QSize, Qt, Signal
+from PySide6.QtGui import QColor, QGuiApplication, QIcon, QPainter, QPalette, QPixmap
+from PySide6.QtWidgets import QApplication, QWidget
+
+_logger = logging.getLogger(__name__)
+
+# Icon names mapped to the qtawesome glyphs they are rendered from
+GLYPHS = {
+    "close": "mdi.close",
+    "play": "mdi.play",
+    "pause": "mdi.pause",
+    "next": "mdi.skip-next",
+    "previous": "mdi.skip-previous",
+    "like": "mdi.thumb-up-outline",
+    "liked": "mdi.thumb-up",
+    "dislike": "mdi.thumb-down-outline",
+    "disliked": "mdi.thumb-down",
+}
+
+# Logical sizes every icon is pre-rendered at, the ones the UI uses
+ICON_SIZES = (16, 32)
+
+IconKey = tuple[int, int, float]
+
+
+class IconRegistry(QObject):
+    """Pre-rendered icons for the player controls.
+
+    qtawesome icons paint their glyph from the icon font every time they are
+    drawn. Here every icon is rendered once per theme and device pixel ratio
+    into plain pixmaps, so switching an icon is only a QIcon swap. The icons
+    are re-rendered, and iconsChanged emitted, only when the watched widget
+    reports a palette or device pixel ratio change. Sets rendered earlier
+    are kept, switching back costs nothing.
+    """
+
+    iconsChanged = Signal()
+
+    def __init__(self, widget: QWidget | None = None, parent=None):
+        super().__init__(parent or widget)
+        self._widget = widget
+        self._atlases: dict[IconKey, dict[str, QIcon]] = {}
+        self._key = self._current_key()
+        if widget is not None:
+            widget.installEventFilter(self)
+
+    def icon(self, name: str) -> QIcon:
+        atlas = self._atlases.get(self._key)
+        if atlas is None:
+            atlas = self._render(self._key)
+            self._atlases[self._key] = atlas
+        return atlas[name]
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() in (
+            QEvent.Type.PaletteChange,
+            QEvent.Type.DevicePixelRatioChange,
+        ):
+            key = self._current_key()
+            if key != self._key:
+                self._key = key
+                self.iconsChanged.emit()
+        return super().eventFilter(watched, event)
+
+    def _palette(self) -> QPalette:
+        if self._widget is not None:
+            return self._widget.palette()
+        return QApplication.palette()
+
+    def _device_pixel_ratio(self) -> float:
+        if self._widget is not None:
+            return self._widget.devicePixelRatioF()
+        return QGuiApplication.primaryScreen().devicePixelRatio()
+
+    def _current_key(self) -> IconKey:
+        palette = self._palette()
+        return (
+            palette.color(QPalette.ColorRole.WindowText).rgba(),
+            palette.color(
+                QPalette.ColorGroup.Disabled, QPalette.ColorRole.WindowText
+            ).rgba(),
+            self._device_pixel_ratio(),
+        )
+
+    @staticmethod
+    def _render(key: IconKey) -> dict[str, QIcon]:
+        color, disabled_color, device_pixel_ratio = key
+        _logger.debug("Rendering icons at %sx", device_pixel_ratio)
+
+        atlas = {}
+        for name, glyph in GLYPHS.items():
+            source = qta.icon(
+                glyph,
+                color=QColor.fromRgba(color),
+                color_disabled=QColor.fromRgba(disabled_color),
+            )
+            icon = QIcon()
+            for size in ICON_SIZES:
+                for mode in (QIcon.Mode.Normal, QIcon.Mode.Disabled):
+                    pixmap = QPixmap(QSize(size, size) * device_pixel_ratio)
+                    pixmap.setDevicePixelRatio(device_pixel_ratio)
+                    pixmap.fill(Qt.GlobalColor.transparent)
+                    painter = QPainter(pixmap)
+                    source.paint(
+                        painter,
+                        QRect(0, 0, size, size),
+                        Qt.AlignmentFlag.AlignCenter,
+                        mode,
+                    )
+                    painter.end()
+                    icon.addPixmap(pixmap, mode)
+            atlas[name] = icon
+        return atlas
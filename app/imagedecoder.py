@@ -0,0 +1,82 @@
+import logging
+import time
+
+from PySide6.QtCore import (
+    QBuffer,
+    QByteArray,
+    QObject,
+    QSize,
+    Qt,
+    QThreadPool,
+    Signal,
+)
+from PySide6.QtGui import QImage, QImageReader
+
+from app.metrics import registry
+
+_logger = logging.getLogger(__name__)
+
+
+def decode_image(data: bytes, size: int) -> QImage:
+    """Decodes image data scaled to fit a size x size square.
+
+    Formats that support it (e.g. JPEG) are downscaled while decoding.
+    Returns a null image on failure.
+    """
+    buffer = QBuffer()
+    buffer.setData(QByteArray(data))
+    buffer.open(QBuffer.OpenModeFlag.ReadOnly)
+
+    reader = QImageReader(buffer)
+    source_size = reader.size()
+    target_size = QSize(size, size)
+    if source_size.isValid():
+        scaled_size = source_size.scaled(
+            target_size, Qt.AspectRatioMode.KeepAspectRatio
+        )
+        if scaled_size.width() < source_size.width():
+            reader.setScaledSize(scaled_size)
+            reader.setQuality(100)
+
+    image = reader.read()
+    if image.isNull():
+        _logger.warning("Failed to decode image: %s", reader.errorString())
+        return image
+
+    if image.width() != size and image.height() != size:
+        image = image.scaled(
+            target_size,
+            Qt.AspectRatioMode.KeepAspectRatio,
+            Qt.TransformationMode.SmoothTransformation,
+        )
+    return image
+
+
+class ImageDecoder(QObject):
+    """Decodes and scales images on a thread pool.
+
+    The decoded signal is delivered in the thread the decoder lives in with
+    the key passed to decode and the resulting image, null on failure.
+    """
+
+    decoded = Signal(str, QImage)
+
+    def __init__(self, pool: QThreadPool | None = None, parent=None):
+        super().__init__(parent)
+        self._pool = pool or QThreadPool.globalInstance()
+
+    def decode(self, key: str, data: bytes, size: int):
+        self._pool.start(lambda: self._decode(key, data, size))
+
+    def _decode(self, key: str, data: bytes, size: int):
+        # Runs on a pool thread
+        started = time.perf_counter()
+        try:
+            image = decode_image(data, size)
+        except Exception as ex:
+            _logger.exception(ex)
+            image = QImage()
+        registry.observe(
+            "ytmdr_artwork_decode_ms", (time.perf_counter() - started) * 1000
+        )
+        self.decoded.emit(key, image)
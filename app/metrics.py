@@ -0,0 +1,285 @@
+import bisect
+import json
+import logging
+import signal
+import threading
+import time
+import typing
+
+from PySide6.QtCore import QObject
+from PySide6.QtNetwork import QHostAddress, QTcpServer, QTcpSocket
+
+from app.signalnotifier import SignalNotifier
+
+_logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets in milliseconds
+DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, str] | None) -> Labels:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict[str, typing.Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class MetricsRegistry:
+    """Thread safe counters, gauges and histograms keyed by name and labels.
+
+    Collectors are callables returning extra gauges (e.g. cache statistics)
+    that are only evaluated when the metrics are exported.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, dict[Labels, float]] = {}
+        self._gauges: dict[str, dict[Labels, float]] = {}
+        self._histograms: dict[str, dict[Labels, Histogram]] = {}
+        self._collectors: list[
+            tuple[str, dict[str, str], typing.Callable[[], dict[str, float]]]
+        ] = []
+
+    def increment(self, name: str, labels: dict[str, str] | None = None, value=1):
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def setGauge(self, name: str, value: float, labels: dict[str, str] | None = None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def addGauge(self, name: str, delta: float, labels: dict[str, str] | None = None):
+        key = _labels(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, labels: dict[str, str] | None = None):
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def addCollector(
+        self,
+        prefix: str,
+        collector: typing.Callable[[], dict[str, float]],
+        labels: dict[str, str] | None = None,
+    ):
+        with self._lock:
+            self._collectors.append((prefix, labels or {}, collector))
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+            self._collectors.clear()
+
+    def _collect(self) -> dict[str, dict[Labels, float]]:
+        gauges = {name: dict(series) for name, series in self._gauges.items()}
+        for prefix, labels, collector in self._collectors:
+            try:
+                values = collector()
+            except Exception as ex:
+                _logger.exception(ex)
+                continue
+            for name, value in values.items():
+                gauges.setdefault(f"{prefix}_{name}", {})[_labels(labels)] = value
+        return gauges
+
+    def snapshot(self) -> dict[str, typing.Any]:
+        """Returns all metrics as JSON serializable data."""
+
+        def series(values: dict[Labels, typing.Any], convert=lambda value: value):
+            return [
+                {"labels": dict(labels), "value": convert(value)}
+                for labels, value in values.items()
+            ]
+
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "counters": {
+                    name: series(values) for name, values in self._counters.items()
+                },
+                "gauges": {
+                    name: series(values) for name, values in self._collect().items()
+                },
+                "histograms": {
+                    name: series(values, Histogram.snapshot)
+                    for name, values in self._histograms.items()
+                },
+            }
+
+    def prometheus(self) -> str:
+        """Returns all metrics in the Prometheus text exposition format."""
+
+        def format_labels(labels: Labels, extra: Labels = ()) -> str:
+            labels = labels + extra
+            if not labels:
+                return ""
+            escaped = (
+                (key, value.replace("\\", "\\\\").replace('"', '\\"'))
+                for key, value in labels
+            )
+            return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+        lines = []
+        with self._lock:
+            for name, values in self._counters.items():
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in values.items():
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name, values in self._collect().items():
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in values.items():
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name, values in self._histograms.items():
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in values.items():
+                    cumulative = 0
+                    for bound, count in zip(
+                        histogram.buckets + (float("inf"),), histogram.counts
+                    ):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else str(bound)
+                        lines.append(
+                            f"{name}_bucket{format_labels(labels, (('le', le),))} "
+                            f"{cumulative}"
+                        )
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+                    lines.append(
+                        f"{name}_count{format_labels(labels)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class MetricsServer(QObject):
+    """Serves the registry in Prometheus format over HTTP on localhost."""
+
+    def __init__(self, port: int, parent=None):
+        super().__init__(parent)
+        self._port = port
+        self._server = QTcpServer(self)
+        self._server.newConnection.connect(self._handle_new_connection)
+
+    def listen(self) -> bool:
+        if not self._server.listen(QHostAddress.SpecialAddress.LocalHost, self._port):
+            _logger.error(
+                "Failed to serve metrics on port %s: %s",
+                self._port,
+                self._server.errorString(),
+            )
+            return False
+
+        _logger.info("Serving metrics on http://localhost:%s/metrics", self._port)
+        return True
+
+    def _handle_new_connection(self):
+        while self._server.hasPendingConnections():
+            socket = self._server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self._handle_request(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def _handle_request(self, socket: QTcpSocket):
+        # Wait for the end of the request headers, the body is ignored
+        if not socket.peek(8192).data().find(b"\r\n\r\n") >= 0:
+            return
+
+        request_line = socket.readLine().data().split(b" ")
+        socket.readAll()
+        if len(request_line) >= 2 and request_line[1].split(b"?")[0] in (
+            b"/",
+            b"/metrics",
+        ):
+            status = b"200 OK"
+            body = registry.prometheus().encode()
+        else:
+            status = b"404 Not Found"
+            body = b"Not found\n"
+
+        socket.write(
+            b"HTTP/1.1 " + status + b"\r\n"
+            b"Content-Type: text/plain; version=0.0.4\r\n"
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: close\r\n\r\n" + body
+        )
+        socket.disconnectFromHost()
+
+
+def dump_metrics(path: str):
+    """Writes the registry as JSON to path, '-' for the standard output."""
+    data = json.dumps(registry.snapshot(), indent=2)
+    if path == "-":
+        print(data)
+        return
+
+    try:
+        with open(path, "w") as file:
+            file.write(data)
+    except OSError as ex:
+        _logger.error("Failed to write metrics to %s: %s", path, ex)
+
+
+class MetricsExporter(QObject):
+    """Dumps the registry to a file on exit and on SIGUSR1, and optionally
+    serves it over HTTP."""
+
+    def __init__(
+        self,
+        path: str | None = None,
+        port: int | None = None,
+        signal_notifier: SignalNotifier | None = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._path = path
+        self._server = MetricsServer(port, self) if port else None
+
+        # Not available on Windows
+        if path and signal_notifier and hasattr(signal, "SIGUSR1"):
+            signal_notifier.signalReceived.connect(self._handle_signal)
+            signal_notifier.watch(signal.SIGUSR1)
+
+    def start(self):
+        if self._server:
+            self._server.listen()
+
+    def dump(self):
+        if self._path:
+            dump_metrics(self._path)
+
+    def _handle_signal(self, signum: int):
+        if signum == signal.SIGUSR1:
+            _logger.info("Dumping metrics to %s", self._path)
+            self.dump()
@@ -0,0 +1,447 @@
+import hashlib
+import logging
+import os
+import time
+import typing
+
+from PySide6.QtCore import ClassInfo, Property, QMetaType, QObject, Signal, Slot
+from PySide6.QtDBus import (
+    QDBusAbstractAdaptor,
+    QDBusArgument,
+    QDBusConnection,
+    QDBusError,
+    QDBusMessage,
+    QDBusObjectPath,
+    QDBusVariant,
+)
+
+from app import APP_NAME
+from app.playerstate import PlayerSnapshot
+from app.workermanager import WorkerManager
+
+_logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "org.mpris.MediaPlayer2.ytmdesktopremote"
+OBJECT_PATH = "/org/mpris/MediaPlayer2"
+ROOT_INTERFACE = "org.mpris.MediaPlayer2"
+PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+PROPERTIES_INTERFACE = "org.freedesktop.DBus.Properties"
+
+# Track ids are object paths, this one is reserved for "no track"
+NO_TRACK = "/org/mpris/MediaPlayer2/TrackList/NoTrack"
+TRACK_PATH = "/org/ytmdesktopremote/track"
+# Private object that integers are marshalled through, see _Int64Adaptor
+INT64_PATH = "/org/ytmdesktopremote/int64"
+INT64_INTERFACE = "org.ytmdesktopremote.Int64"
+
+# Snapshot fields mapped to the player properties derived from them
+PROPERTY_FIELDS = {
+    "title": ("Metadata", "PlaybackStatus"),
+    "artist": ("Metadata",),
+    "duration": ("Metadata",),
+    "playing": ("PlaybackStatus",),
+}
+
+
+def playback_status(snapshot: PlayerSnapshot) -> str:
+    if snapshot.playing:
+        return "Playing"
+    return "Paused" if snapshot.title else "Stopped"
+
+
+def metadata(snapshot: PlayerSnapshot) -> dict[str, typing.Any]:
+    if not snapshot.title:
+        return {"mpris:trackid": QDBusObjectPath(NO_TRACK)}
+
+    # The remote API has no track ids that are valid in object paths
+    key = f"{snapshot.title}\n{snapshot.artist}".encode()
+    track_id = hashlib.blake2b(key, digest_size=8).hexdigest()
+    data: dict[str, typing.Any] = {
+        "mpris:trackid": QDBusObjectPath(f"{TRACK_PATH}/{track_id}"),
+        "xesam:title": snapshot.title,
+        "xesam:artist": [snapshot.artist] if snapshot.artist else [],
+    }
+    if snapshot.duration:
+        # Microseconds
+        data["mpris:length"] = int(snapshot.duration * 1_000_000)
+    return data
+
+
+def _string_array(values: list[str]) -> QDBusArgument:
+    argument = QDBusArgument()
+    argument.beginArray(QMetaType(QMetaType.Type.QString))
+    for value in values:
+        argument.appendVariant(value)
+    argument.endArray()
+    return argument
+
+
+@ClassInfo({"D-Bus Interface": INT64_INTERFACE})
+class _Int64Adaptor(QDBusAbstractAdaptor):
+    """Holds a value to be read back as an int64.
+
+    PySide converts a Python int that fits in 32 bits to an int QVariant,
+    which is marshalled as int32, and cannot be asked for a qlonglong. Qt
+    reads properties by their declared type though, so a Properties.Get
+    call for this one returns a variant that is marshalled as int64.
+    """
+
+    def __init__(self, parent: QObject):
+        super().__init__(parent)
+        self.value = 0
+
+    def _value(self) -> int:
+        return self.value
+
+    Value = Property("qlonglong", _value)  # type: ignore
+
+
+# Qt introspects the standard interface itself, the blank description keeps
+# it from being listed twice (an empty one would be generated from the slots)
+@ClassInfo({"D-Bus Interface": PROPERTIES_INTERFACE, "D-Bus Introspection": " "})
+class _PropertiesAdaptor(QDBusAbstractAdaptor):
+    """Answers property calls in place of Qt, which marshals the values in
+    Metadata by their QVariant type and so sends mpris:length as int32."""
+
+    def __init__(self, parent: "MprisService"):
+        super().__init__(parent)
+        self._service = parent
+
+    @Slot(str, str, QDBusMessage)
+    def Get(self, interface: str, name: str, message: QDBusMessage):
+        properties = self._service.interfaceProperties(interface)
+        if properties is None or name not in properties:
+            reply = message.createErrorReply(
+                QDBusError.ErrorType.UnknownProperty,
+                f"No property {name} in interface {interface}",
+            )
+        else:
+            reply = message.createReply()
+            reply.setArguments([self._service.variant(properties[name])])
+        self._reply(message, reply)
+
+    @Slot(str, QDBusMessage)
+    def GetAll(self, interface: str, message: QDBusMessage):
+        properties = self._service.interfaceProperties(interface)
+        if properties is None:
+            reply = message.createErrorReply(
+                QDBusError.ErrorType.UnknownInterface,
+                f"No interface {interface}",
+            )
+        else:
+            reply = message.createReply()
+            reply.setArguments([self._service.variantMap(properties)])
+        self._reply(message, reply)
+
+    @Slot(str, str, QDBusVariant, QDBusMessage)
+    def Set(
+        self, interface: str, name: str, value: QDBusVariant, message: QDBusMessage
+    ):
+        properties = self._service.interfaceProperties(interface)
+        if properties is None or name not in properties:
+            reply = message.createErrorReply(
+                QDBusError.ErrorType.UnknownProperty,
+                f"No property {name} in interface {interface}",
+            )
+        else:
+            reply = message.createErrorReply(
+                QDBusError.ErrorType.PropertyReadOnly, f"Property {name} is read-only"
+            )
+        self._reply(message, reply)
+
+    def _reply(self, message: QDBusMessage, reply: QDBusMessage):
+        message.setDelayedReply(True)
+        self._service.connection().send(reply)
+
+
+@ClassInfo({"D-Bus Interface": ROOT_INTERFACE})
+class _RootAdaptor(QDBusAbstractAdaptor):
+    def __init__(self, parent: "MprisService"):
+        super().__init__(parent)
+
+    @Slot()
+    def Raise(self):
+        pass
+
+    @Slot()
+    def Quit(self):
+        pass
+
+    def _false(self) -> bool:
+        return False
+
+    def _identity(self) -> str:
+        return APP_NAME
+
+    def _empty(self) -> list[str]:
+        return []
+
+    CanQuit = Property(bool, _false)  # type: ignore
+    CanRaise = Property(bool, _false)  # type: ignore
+    HasTrackList = Property(bool, _false)  # type: ignore
+    Identity = Property(str, _identity)  # type: ignore
+    SupportedUriSchemes = Property("QStringList", _empty)  # type: ignore
+    SupportedMimeTypes = Property("QStringList", _empty)  # type: ignore
+
+
+@ClassInfo({"D-Bus Interface": PLAYER_INTERFACE})
+class _PlayerAdaptor(QDBusAbstractAdaptor):
+    Seeked = Signal("qlonglong")
+
+    def __init__(self, parent: "MprisService"):
+        super().__init__(parent)
+        self._service = parent
+
+    @Slot()
+    def Next(self):
+        self._service.manager().requestNextTrack()
+
+    @Slot()
+    def Previous(self):
+        self._service.manager().requestPreviousTrack()
+
+    @Slot()
+    def Pause(self):
+        self._service.manager().requestPause()
+
+    @Slot()
+    def PlayPause(self):
+        self._service.manager().requestTogglePlayPause()
+
+    @Slot()
+    def Stop(self):
+        self._service.manager().requestPause()
+
+    @Slot()
+    def Play(self):
+        self._service.manager().requestPlay()
+
+    # The remote API cannot seek or open URIs, CanSeek tells clients so
+    @Slot("qlonglong")
+    def Seek(self, offset: int):
+        pass
+
+    @Slot(QDBusObjectPath, "qlonglong")
+    def SetPosition(self, track_id: QDBusObjectPath, position: int):
+        pass
+
+    @Slot(str)
+    def OpenUri(self, uri: str):
+        pass
+
+    def _playback_status(self) -> str:
+        return playback_status(self._service.snapshot())
+
+    def _metadata(self) -> dict[str, typing.Any]:
+        return metadata(self._service.snapshot())
+
+    def _position(self) -> int:
+        position = self._service.snapshot().positionAt(time.monotonic())
+        return int(position * 1_000_000)
+
+    def _one(self) -> float:
+        return 1.0
+
+    def _true(self) -> bool:
+        return True
+
+    def _false(self) -> bool:
+        return False
+
+    PlaybackStatus = Property(str, _playback_status)  # type: ignore
+    Metadata = Property("QVariantMap", _metadata)  # type: ignore
+    Position = Property("qlonglong", _position)  # type: ignore
+    Rate = Property(float, _one)  # type: ignore
+    MinimumRate = Property(float, _one)  # type: ignore
+    MaximumRate = Property(float, _one)  # type: ignore
+    Volume = Property(float, _one)  # type: ignore
+    CanGoNext = Property(bool, _true)  # type: ignore
+    CanGoPrevious = Property(bool, _true)  # type: ignore
+    CanPlay = Property(bool, _true)  # type: ignore
+    CanPause = Property(bool, _true)  # type: ignore
+    CanSeek = Property(bool, _false)  # type: ignore
+    CanControl = Property(bool, _true)  # type: ignore
+
+
+class MprisService(QObject):
+    """Publishes the active worker as an MPRIS2 media player on D-Bus.
+
+    Desktop environments deliver media keys to MPRIS players and show what
+    they are playing, so no global keyboard hook is needed. Properties are
+    read from the last PlayerSnapshot, PropertiesChanged is only sent for
+    the properties whose values changed and Seeked when the position jumps.
+
+    The connection defaults to the session bus, tests can pass one to a
+    private bus (QDBusConnection.connectToBus).
+    """
+
+    def __init__(
+        self,
+        manager: WorkerManager,
+        connection: QDBusConnection | None = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._manager = manager
+        self._connection = connection or QDBusConnection.sessionBus()
+        self._service_name: str | None = None
+        self._snapshot = manager.snapshot()
+        self._published = self._properties(self._snapshot, PROPERTY_FIELDS)
+
+        self._root_adaptor = _RootAdaptor(self)
+        self._player_adaptor = _PlayerAdaptor(self)
+        self._properties_adaptor = _PropertiesAdaptor(self)
+        self._adaptors: dict[str, QDBusAbstractAdaptor] = {
+            ROOT_INTERFACE: self._root_adaptor,
+            PLAYER_INTERFACE: self._player_adaptor,
+        }
+        self._int64_object = QObject(self)
+        self._int64_adaptor = _Int64Adaptor(self._int64_object)
+        manager.stateChanged.connect(self._handle_state_changed)
+
+    def manager(self) -> WorkerManager:
+        return self._manager
+
+    def connection(self) -> QDBusConnection:
+        return self._connection
+
+    def snapshot(self) -> PlayerSnapshot:
+        return self._snapshot
+
+    def serviceName(self) -> str | None:
+        return self._service_name
+
+    def register(self) -> bool:
+        if not self._connection.isConnected():
+            _logger.warning("Not publishing over MPRIS: no D-Bus session bus")
+            return False
+
+        if not self._connection.registerObject(
+            OBJECT_PATH, self, QDBusConnection.RegisterOption.ExportAdaptors
+        ):
+            _logger.warning(f"Failed to register {OBJECT_PATH} on D-Bus")
+            return False
+        self._connection.registerObject(
+            INT64_PATH,
+            self._int64_object,
+            QDBusConnection.RegisterOption.ExportAdaptors,
+        )
+
+        # Further instances get their own name, as the specification asks
+        for name in (SERVICE_NAME, f"{SERVICE_NAME}.instance{os.getpid()}"):
+            if self._connection.registerService(name):
+                self._service_name = name
+                _logger.info(f"Publishing over MPRIS as {name}")
+                return True
+
+        _logger.warning(
+            f"Failed to register {SERVICE_NAME}: "
+            f"{self._connection.lastError().message()}"
+        )
+        self._connection.unregisterObject(OBJECT_PATH)
+        self._connection.unregisterObject(INT64_PATH)
+        return False
+
+    def unregister(self):
+        if self._service_name is None:
+            return
+
+        self._connection.unregisterService(self._service_name)
+        self._connection.unregisterObject(OBJECT_PATH)
+        self._connection.unregisterObject(INT64_PATH)
+        self._service_name = None
+
+    def interfaceProperties(self, interface: str) -> dict[str, typing.Any] | None:
+        """The current values of the properties of an interface, None for
+        unknown interfaces."""
+        adaptor = self._adaptors.get(interface)
+        if adaptor is None:
+            return None
+
+        meta = adaptor.metaObject()
+        names = (
+            meta.property(index).name()
+            for index in range(meta.propertyOffset(), meta.propertyCount())
+        )
+        return {name: getattr(adaptor, name) for name in names}
+
+    def variant(self, value: typing.Any) -> QDBusVariant:
+        """Wraps a property value for D-Bus: integers as int64, lists as
+        string arrays and dicts as a{sv}."""
+        if isinstance(value, bool):
+            return QDBusVariant(value)
+        if isinstance(value, int):
+            return self._int64(value)
+        if isinstance(value, list):
+            return QDBusVariant(_string_array(value))
+        if isinstance(value, dict):
+            return QDBusVariant(self.variantMap(value))
+        return QDBusVariant(value)
+
+    def variantMap(self, values: dict[str, typing.Any]) -> QDBusArgument:
+        argument = QDBusArgument()
+        argument.beginMap(
+            QMetaType(QMetaType.Type.QString), QMetaType.fromName(b"QDBusVariant")
+        )
+        for key, value in values.items():
+            argument.beginMapEntry()
+            argument.appendVariant(key)
+            argument.appendVariant(self.variant(value))
+            argument.endMapEntry()
+        argument.endMap()
+        return argument
+
+    def _int64(self, value: int) -> QDBusVariant:
+        # A local call, Qt answers it without going through the bus
+        self._int64_adaptor.value = value
+        message = QDBusMessage.createMethodCall(
+            self._connection.baseService(), INT64_PATH, PROPERTIES_INTERFACE, "Get"
+        )
+        message.setArguments([INT64_INTERFACE, "Value"])
+        return self._connection.call(message).arguments()[0]
+
+    def _handle_state_changed(
+        self, snapshot: PlayerSnapshot, changed: frozenset[str]
+    ):
+        self._snapshot = snapshot
+        if self._service_name is None:
+            return
+
+        properties = self._properties(snapshot, changed)
+        properties = {
+            name: value
+            for name, value in properties.items()
+            if self._published.get(name) != value
+        }
+        if properties:
+            self._published.update(properties)
+            self._send_properties_changed(properties)
+
+        # Playback starting, stopping or a new track moves the position as
+        # expected, anything else is a seek or a resync after drift
+        if changed == {"position"}:
+            self._player_adaptor.Seeked.emit(
+                int(snapshot.positionAt(time.monotonic()) * 1_000_000)
+            )
+
+    @staticmethod
+    def _properties(
+        snapshot: PlayerSnapshot, fields: typing.Iterable[str]
+    ) -> dict[str, typing.Any]:
+        names = {name for field in fields for name in PROPERTY_FIELDS.get(field, ())}
+        properties: dict[str, typing.Any] = {}
+        if "PlaybackStatus" in names:
+            properties["PlaybackStatus"] = playback_status(snapshot)
+        if "Metadata" in names:
+            properties["Metadata"] = metadata(snapshot)
+        return properties
+
+    def _send_properties_changed(self, properties: dict[str, typing.Any]):
+        _logger.debug("MPRIS properties changed: %s", ", ".join(properties))
+        message = QDBusMessage.createSignal(
+            OBJECT_PATH, PROPERTIES_INTERFACE, "PropertiesChanged"
+        )
+        message.setArguments(
+            [PLAYER_INTERFACE, self.variantMap(properties), _string_array([])]
+        )
+        self._connection.send(message)
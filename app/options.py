@@ -0,0 +1,170 @@
+import sys
+from dataclasses import dataclass, field
+
+from PySide6.QtCore import QCommandLineOption, QCommandLineParser, QCoreApplication
+
+from app.pollscheduler import PollPolicy
+
+from . import APP_DESCRIPTION
+
+DEFAULT_SERVER = "http://localhost:13091"
+DEFAULT_SOCKET_NAME = "ytm-desktop-remote"
+
+
+@dataclass
+class Options:
+    servers: list[str] = field(default_factory=lambda: [DEFAULT_SERVER])
+    listen: bool = False
+    mpris: bool = False
+    realtime: bool = False
+    poll_policy: PollPolicy = field(default_factory=PollPolicy)
+    headless: bool = False
+    socket_name: str = DEFAULT_SOCKET_NAME
+    metrics_file: str | None = None
+    metrics_port: int | None = None
+    startup_profile: bool = False
+    marquee: bool = False
+    history: bool = False
+
+
+def _int_value(parser: QCommandLineParser, option: QCommandLineOption) -> int:
+    value = parser.value(option)
+    try:
+        return int(value)
+    except ValueError:
+        print(f"Invalid value for --{option.names()[-1]}: {value}", file=sys.stderr)
+        sys.exit(1)
+
+
+def server_url(value: str) -> str:
+    """A server URL without trailing slashes, the form workers and the
+    saved states are keyed by."""
+    return value.rstrip("/")
+
+
+def parse_options(app: QCoreApplication) -> Options:
+    """Parses the command line, exits on errors, --help and --version."""
+    parser = QCommandLineParser()
+    parser.setApplicationDescription(APP_DESCRIPTION)
+    parser.addHelpOption()
+    parser.addVersionOption()
+
+    server_option = QCommandLineOption(
+        ["s", "server"],
+        "Server URL, can be given several times to control several servers",
+        "server",
+        defaultValue=DEFAULT_SERVER,
+    )
+    parser.addOption(server_option)
+    listener_option = QCommandLineOption(
+        ["l", "listen"], "Listen for the hotkeys configured in the settings"
+    )
+    parser.addOption(listener_option)
+    mpris_option = QCommandLineOption(
+        ["mpris"],
+        "Publish the player over MPRIS on the D-Bus session bus, the desktop "
+        "then delivers media keys without a keyboard hook",
+    )
+    parser.addOption(mpris_option)
+    realtime_option = QCommandLineOption(
+        ["r", "realtime"],
+        "Receive state updates over the server's realtime socket, "
+        "polling only while it is disconnected",
+    )
+    parser.addOption(realtime_option)
+
+    default_policy = PollPolicy()
+    interval_option = QCommandLineOption(
+        ["i", "interval"],
+        "Poll interval while playing (ms)",
+        "ms",
+        defaultValue=str(default_policy.interval),
+    )
+    parser.addOption(interval_option)
+    fast_interval_option = QCommandLineOption(
+        ["fast-interval"],
+        "Poll interval after a command or near the end of a track (ms)",
+        "ms",
+        defaultValue=str(default_policy.fast_interval),
+    )
+    parser.addOption(fast_interval_option)
+    idle_interval_option = QCommandLineOption(
+        ["idle-interval"],
+        "Poll interval while paused or hidden (ms)",
+        "ms",
+        defaultValue=str(default_policy.idle_interval),
+    )
+    parser.addOption(idle_interval_option)
+    max_backoff_option = QCommandLineOption(
+        ["max-backoff"],
+        "Maximum poll interval while the server is unreachable (ms)",
+        "ms",
+        defaultValue=str(default_policy.max_backoff),
+    )
+    parser.addOption(max_backoff_option)
+
+    headless_option = QCommandLineOption(
+        ["headless"],
+        "Run without a user interface, controlled through a local socket",
+    )
+    parser.addOption(headless_option)
+    socket_option = QCommandLineOption(
+        ["socket"],
+        "Name of the local control socket in headless mode",
+        "name",
+        defaultValue=DEFAULT_SOCKET_NAME,
+    )
+    parser.addOption(socket_option)
+
+    metrics_option = QCommandLineOption(
+        ["metrics"],
+        "Write request and repaint metrics as JSON to file on exit and on "
+        "SIGUSR1, - for the standard output",
+        "file",
+    )
+    parser.addOption(metrics_option)
+    metrics_port_option = QCommandLineOption(
+        ["metrics-port"],
+        "Serve metrics in Prometheus text format on localhost",
+        "port",
+    )
+    parser.addOption(metrics_port_option)
+    startup_profile_option = QCommandLineOption(
+        ["startup-profile"],
+        "Print import times and startup milestones to stderr",
+    )
+    parser.addOption(startup_profile_option)
+    marquee_option = QCommandLineOption(
+        ["marquee"], "Scroll titles and artists that do not fit instead of eliding"
+    )
+    parser.addOption(marquee_option)
+    history_option = QCommandLineOption(
+        ["history"],
+        "Record the tracks played to a local database, shown from the tray menu",
+    )
+    parser.addOption(history_option)
+    parser.process(app)
+
+    return Options(
+        servers=[server_url(server) for server in parser.values(server_option)],
+        listen=parser.isSet(listener_option),
+        mpris=parser.isSet(mpris_option),
+        realtime=parser.isSet(realtime_option),
+        poll_policy=PollPolicy(
+            interval=_int_value(parser, interval_option),
+            fast_interval=_int_value(parser, fast_interval_option),
+            idle_interval=_int_value(parser, idle_interval_option),
+            max_backoff=_int_value(parser, max_backoff_option),
+        ),
+        headless=parser.isSet(headless_option),
+        socket_name=parser.value(socket_option),
+        metrics_file=parser.value(metrics_option) or None,
+        metrics_port=(
+            _int_value(parser, metrics_port_option)
+            if parser.isSet(metrics_port_option)
+            else None
+        ),
+        startup_profile=parser.isSet(startup_profile_option),
+        marquee=parser.isSet(marquee_option),
+        history=parser.isSet(history_option),
+    )
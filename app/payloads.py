@@ -0,0 +1,154 @@
+"""Decoding of the remote API payloads.
+
+Only the fields the player shows are picked out of a decoded payload, into
+small slotted dataclasses, so the rest of the (large) reply is dropped right
+away and the code applying them does not need to check keys and types.
+
+JSON is decoded with orjson or msgspec when one of them is installed, with
+the json module otherwise. All of them take the reply bytes as they are.
+"""
+
+import dataclasses
+import typing
+
+try:
+    from orjson import loads  # type: ignore
+
+    JSON_BACKEND = "orjson"
+except ImportError:
+    try:
+        from msgspec.json import decode as loads  # type: ignore
+
+        JSON_BACKEND = "msgspec"
+    except ImportError:
+        from json import loads  # type: ignore
+
+        JSON_BACKEND = "json"
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Thumbnail:
+    url: str
+    width: int = 0
+    height: int = 0
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class TrackInfo:
+    """A track, fields the payload did not carry are None."""
+
+    video_id: str | None = None
+    title: str | None = None
+    artist: str | None = None
+    # Seconds
+    duration: float | None = None
+    thumbnails: tuple[Thumbnail, ...] = ()
+
+    def trackId(self) -> str | None:
+        return self.video_id if self.video_id is not None else self.title
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class PlayerState:
+    """Player state, fields the payload did not carry are None."""
+
+    playing: bool | None = None
+    liked: bool | None = None
+    disliked: bool | None = None
+    # Seconds
+    progress: float | None = None
+
+
+def _string(value: typing.Any) -> str | None:
+    return value if isinstance(value, str) else None
+
+
+def _bool(value: typing.Any) -> bool | None:
+    return value if isinstance(value, bool) else None
+
+
+def _number(value: typing.Any) -> float | None:
+    # The server sends some numbers as strings, e.g. lengthSeconds
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _thumbnails(value: typing.Any) -> tuple[Thumbnail, ...]:
+    if not isinstance(value, list):
+        return ()
+
+    thumbnails = []
+    for thumbnail in value:
+        if not isinstance(thumbnail, dict):
+            continue
+        url = thumbnail.get("url")
+        if not isinstance(url, str):
+            continue
+        width = _number(thumbnail.get("width"))
+        height = _number(thumbnail.get("height"))
+        thumbnails.append(Thumbnail(url, int(width or 0), int(height or 0)))
+    return tuple(thumbnails)
+
+
+def _track(data: dict[str, typing.Any], thumbnails: typing.Any) -> TrackInfo:
+    return TrackInfo(
+        video_id=_string(data.get("videoId")),
+        title=_string(data.get("title")),
+        artist=_string(data.get("author")),
+        duration=_number(data.get("lengthSeconds")),
+        thumbnails=_thumbnails(thumbnails),
+    )
+
+
+def parse_track(data: typing.Any) -> TrackInfo | None:
+    """Picks the current track out of a /track payload or track event."""
+    if not isinstance(data, dict):
+        return None
+
+    video = data.get("video")
+    if not isinstance(video, dict):
+        return None
+
+    thumbnail = video.get("thumbnail")
+    thumbnails = thumbnail.get("thumbnails") if isinstance(thumbnail, dict) else None
+    return _track(video, thumbnails)
+
+
+def parse_state(data: typing.Any) -> PlayerState | None:
+    """Picks the player state out of a /track/state payload or state event."""
+    if not isinstance(data, dict) or not data:
+        return None
+
+    return PlayerState(
+        playing=_bool(data.get("playing")),
+        liked=_bool(data.get("liked")),
+        disliked=_bool(data.get("disliked")),
+        progress=_number(data.get("progress")),
+    )
+
+
+def parse_next_track(data: typing.Any) -> TrackInfo | None:
+    """Picks the track after the selected one out of a /queue payload."""
+    if not isinstance(data, dict):
+        return None
+
+    items = data.get("items")
+    index = data.get("selectedItemIndex")
+    if not isinstance(items, list) or not isinstance(index, int):
+        return None
+
+    if not 0 <= index + 1 < len(items):
+        return None
+
+    item = items[index + 1]
+    if not isinstance(item, dict):
+        return None
+    return _track(item, item.get("thumbnails"))
@@ -0,0 +1,135 @@
+import dataclasses
+import time
+
+from PySide6.QtGui import QImage
+
+# Fields of PlayerSnapshot, in the order they are applied
+FIELDS = (
+    "title",
+    "artist",
+    "playing",
+    "liked",
+    "disliked",
+    "artwork",
+    "duration",
+    "position",
+    "stale",
+)
+
+# Difference between the reported and the interpolated position (seconds)
+# above which the position is resynced. The server reports whole seconds.
+DRIFT_THRESHOLD = 1.5
+
+
+@dataclasses.dataclass(frozen=True)
+class PlayerSnapshot:
+    """Immutable copy of what the remote shows for one server.
+
+    The position is the one at position_time (time.monotonic()), use
+    positionAt to interpolate it while playing. Snapshots are passed from
+    the worker thread to the GUI thread, hence a QImage for the artwork
+    that is never modified once set. Stale snapshots were restored from
+    the last session and are shown until the server first answers.
+    """
+
+    title: str = ""
+    artist: str = ""
+    playing: bool = False
+    liked: bool = False
+    disliked: bool = False
+    artwork: QImage | None = None
+    duration: float = 0.0
+    position: float = 0.0
+    position_time: float = 0.0
+    stale: bool = False
+
+    def positionAt(self, now: float) -> float:
+        if not self.playing:
+            return self.position
+
+        position = self.position + now - self.position_time
+        return min(position, self.duration) if self.duration else position
+
+    def diff(self, other: "PlayerSnapshot | None") -> frozenset[str]:
+        """Names of the fields that differ from other, all of them if None."""
+        if other is None:
+            return frozenset(FIELDS)
+
+        changed = set()
+        for field in FIELDS:
+            value = getattr(self, field)
+            previous = getattr(other, field)
+            # Images are not compared by value, a new one is a change
+            if value is not previous and (field == "artwork" or value != previous):
+                changed.add(field)
+        if self.position_time != other.position_time:
+            changed.add("position")
+        return frozenset(changed)
+
+
+class PositionClock:
+    """Interpolates the playback position between server reports.
+
+    The position is anchored at a monotonic time and advanced locally while
+    playing. Reports from the server only move the anchor when they drift
+    too far from the interpolated position (e.g. after a seek), so polling
+    does not make the position jump back and forth.
+    """
+
+    def __init__(self, drift_threshold: float = DRIFT_THRESHOLD):
+        self._drift_threshold = drift_threshold
+        self._duration = 0.0
+        self._position = 0.0
+        self._position_time = time.monotonic()
+        self._playing = False
+
+    def duration(self) -> float:
+        return self._duration
+
+    def setDuration(self, duration: float):
+        self._duration = duration
+
+    def anchor(self) -> tuple[float, float]:
+        """The position and the monotonic time it was measured at."""
+        return self._position, self._position_time
+
+    def position(self, now: float | None = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        if not self._playing:
+            return self._position
+
+        position = self._position + now - self._position_time
+        return min(position, self._duration) if self._duration else position
+
+    def remaining(self) -> float | None:
+        if not self._duration:
+            return None
+        return max(self._duration - self.position(), 0.0)
+
+    def reset(self, duration: float = 0.0):
+        """Starts a new track."""
+        self._duration = duration
+        self._anchor(0.0)
+
+    def setPlaying(self, playing: bool) -> bool:
+        """Re-anchors the position when playback starts or stops."""
+        if playing == self._playing:
+            return False
+
+        position = self.position()
+        self._playing = playing
+        self._anchor(position)
+        return True
+
+    def sync(self, position: float) -> bool:
+        """Applies a reported position, returns True if it moved the anchor."""
+        if abs(position - self.position()) <= self._drift_threshold:
+            return False
+
+        self._anchor(position)
+        return True
+
+    def _anchor(self, position: float):
+        self._position = position
+        self._position_time = time.monotonic()
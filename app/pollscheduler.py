@@ -0,0 +1,147 @@
+import random
+import time
+from dataclasses import dataclass
+
+from PySide6.QtCore import QObject, QTimer, Signal
+
+
+@dataclass
+class PollPolicy:
+    """Poll cadences in milliseconds."""
+
+    # While playing with the mini player visible
+    interval: int = 1000
+    # Right after a command or near the end of a track
+    fast_interval: int = 250
+    # While paused or with the mini player hidden
+    idle_interval: int = 5000
+    # Upper bound of the backoff while the server is unreachable
+    max_backoff: int = 60000
+    # How long to poll fast after a command
+    fast_duration: int = 3000
+    # How close to the end of a track to start polling fast
+    track_end_window: int = 2000
+    # Fraction of the backoff interval that is randomized
+    jitter: float = 0.5
+
+
+class PollScheduler(QObject):
+    """Decides when the next status poll should happen.
+
+    Emits pollRequested at an interval chosen from the policy depending on
+    the player state, the mini player visibility and the server health.
+    """
+
+    pollRequested = Signal()
+
+    def __init__(self, policy: PollPolicy | None = None, parent=None):
+        super().__init__(parent)
+        self._policy = policy or PollPolicy()
+        self._playing = False
+        self._visible = True
+        self._failures = 0
+        self._failed_poll = False
+        self._fast_until = 0.0
+        self._track_end: float | None = None
+
+        self._timer = QTimer(self, singleShot=True)
+        self._timer.timeout.connect(self._handle_timeout)
+
+    def policy(self) -> PollPolicy:
+        return self._policy
+
+    def isActive(self) -> bool:
+        return self._timer.isActive()
+
+    def isReachable(self) -> bool:
+        return self._failures == 0
+
+    def start(self, delay: int = 0):
+        """Polls after delay milliseconds and keeps polling until stopped."""
+        self._timer.start(delay)
+
+    def stop(self):
+        self._timer.stop()
+
+    def boost(self):
+        """Polls fast for a while, used after sending a command."""
+        self._fast_until = time.monotonic() + self._policy.fast_duration / 1000
+        self._reschedule()
+
+    def setPlaying(self, playing: bool):
+        if playing != self._playing:
+            self._playing = playing
+            self._reschedule()
+
+    def setVisible(self, visible: bool):
+        if visible != self._visible:
+            self._visible = visible
+            self._reschedule()
+
+    def setRemainingTime(self, remaining: int | None):
+        """Sets the time left in the current track in milliseconds."""
+        if remaining is None:
+            self._track_end = None
+        else:
+            self._track_end = time.monotonic() + remaining / 1000
+        self._reschedule()
+
+    def reportSuccess(self) -> bool:
+        """Records a successful poll, returns True if the server recovered."""
+        if self._failures == 0:
+            return False
+
+        self._failures = 0
+        self._reschedule()
+        return True
+
+    def reportFailure(self) -> bool:
+        """Records a failed poll, returns True if it is the first failure."""
+        # A poll hits several endpoints, only back off once per poll
+        if self._failed_poll:
+            return False
+
+        self._failed_poll = True
+        self._failures += 1
+        if self._timer.isActive():
+            self._timer.start(self.nextInterval())
+        return self._failures == 1
+
+    def nextInterval(self) -> int:
+        policy = self._policy
+        if self._failures:
+            backoff = min(
+                policy.max_backoff, policy.interval * 2 ** (self._failures - 1)
+            )
+            return int(backoff * (1 - policy.jitter * random.random()))
+
+        now = time.monotonic()
+        if now < self._fast_until:
+            return policy.fast_interval
+
+        if not self._playing:
+            return policy.idle_interval
+
+        interval = policy.interval if self._visible else policy.idle_interval
+        if self._track_end is not None:
+            remaining = (self._track_end - now) * 1000
+            if remaining <= policy.track_end_window:
+                return policy.fast_interval
+
+            # Wake up in time to catch the track change
+            interval = min(interval, int(remaining - policy.track_end_window))
+
+        return max(policy.fast_interval, interval)
+
+    def _reschedule(self):
+        # Only ever brings the next poll forward, a poll in flight will
+        # re-arm the timer with the new cadence anyway.
+        if self._timer.isActive():
+            interval = self.nextInterval()
+            if interval < self._timer.remainingTime():
+                self._timer.start(interval)
+
+    def _handle_timeout(self):
+        self._failed_poll = False
+        self._timer.start(self.nextInterval())
+        self.pollRequested.emit()
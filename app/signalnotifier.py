@@ -0,0 +1,40 @@
+import signal
+import socket
+
+from PySide6.QtCore import QObject, QSocketNotifier, Signal
+
+
+class SignalNotifier(QObject):
+    """Delivers POSIX signals through the Qt event loop.
+
+    Python only runs signal handlers between bytecodes, which never happens
+    while Qt's event loop is blocked waiting for events. The signal number
+    is written to a socket instead and picked up by a QSocketNotifier.
+    """
+
+    signalReceived = Signal(int)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._read_socket, self._write_socket = socket.socketpair()
+        self._read_socket.setblocking(False)
+        self._write_socket.setblocking(False)
+        signal.set_wakeup_fd(self._write_socket.fileno())
+
+        self._notifier = QSocketNotifier(
+            self._read_socket.fileno(), QSocketNotifier.Type.Read, self
+        )
+        self._notifier.activated.connect(self._handle_activated)
+
+    def watch(self, signum: int):
+        # A Python level handler is needed for the wakeup fd to be written
+        signal.signal(signum, lambda *args: None)
+
+    def _handle_activated(self):
+        try:
+            data = self._read_socket.recv(64)
+        except BlockingIOError:
+            return
+
+        for signum in data:
+            self.signalReceived.emit(signum)
@@ -0,0 +1,179 @@
+import dataclasses
+import json
+import logging
+import os
+import time
+import typing
+
+from PySide6.QtCore import QObject, QStandardPaths, QTimer
+
+from app.playerstate import PlayerSnapshot
+
+_logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Changes are written at most this often (ms), and on stop
+SAVE_INTERVAL = 5000
+# Servers remembered, the ones saved to least recently are dropped
+MAX_SERVERS = 16
+# Snapshot fields whose changes are saved, the position is only saved
+# along with them and on stop
+SAVED_FIELDS = frozenset(
+    {"title", "artist", "playing", "liked", "disliked", "artwork", "duration"}
+)
+
+
+def default_snapshot_path() -> str:
+    location = QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.CacheLocation
+    )
+    return os.path.join(location, "state.json")
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class SavedState:
+    """What a server last showed, enough to draw the player before it
+    answers. The artwork is referenced by url, its data is in the
+    ArtworkCache."""
+
+    title: str = ""
+    artist: str = ""
+    playing: bool = False
+    liked: bool = False
+    disliked: bool = False
+    # Seconds
+    duration: float = 0.0
+    position: float = 0.0
+    artwork_url: str | None = None
+    # time.time() at which it was saved
+    saved_at: float = 0.0
+
+    def snapshot(self) -> PlayerSnapshot:
+        """A stale snapshot to show until the server answers, paused so
+        its position stays put."""
+        return PlayerSnapshot(
+            title=self.title,
+            artist=self.artist,
+            playing=False,
+            liked=self.liked,
+            disliked=self.disliked,
+            duration=self.duration,
+            position=self.position,
+            position_time=time.monotonic(),
+            stale=True,
+        )
+
+
+def _parse(data: typing.Any) -> SavedState | None:
+    """Builds a state from decoded JSON, skipping values of the wrong type."""
+    if not isinstance(data, dict):
+        return None
+
+    values: dict[str, typing.Any] = {}
+    for field in dataclasses.fields(SavedState):
+        value = data.get(field.name)
+        if field.type is bool:
+            if isinstance(value, bool):
+                values[field.name] = value
+        elif field.type is float:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[field.name] = float(value)
+        # str and str | None
+        elif isinstance(value, str):
+            values[field.name] = value
+    return SavedState(**values)
+
+
+class SnapshotStore(QObject):
+    """Persists the last known state of each server to a JSON file.
+
+    The file is read once when the store is created, before the event
+    loop runs, so the remote can show the last track right away. Saved
+    states are collected in memory and written together at most every
+    SAVE_INTERVAL ms, atomically, and on flush. Lives on the thread of the
+    workers saving to it, see WorkerManager.
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        save_interval: int = SAVE_INTERVAL,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._path = path or default_snapshot_path()
+        self._states: dict[str, SavedState] = self._load()
+        self._dirty = False
+        self._save_timer = QTimer(self, interval=save_interval, singleShot=True)
+        self._save_timer.timeout.connect(self.flush)
+
+    def path(self) -> str:
+        return self._path
+
+    def state(self, server: str) -> SavedState | None:
+        return self._states.get(server)
+
+    def save(self, server: str, state: SavedState):
+        """Stores a state, written to disk within the save interval."""
+        if self._states.get(server) == state:
+            return
+
+        self._states[server] = state
+        self._dirty = True
+        if not self._save_timer.isActive():
+            self._save_timer.start()
+
+    def flush(self):
+        self._save_timer.stop()
+        if not self._dirty:
+            return
+
+        self._dirty = False
+        if len(self._states) > MAX_SERVERS:
+            recent = sorted(self._states.items(), key=lambda item: item[1].saved_at)
+            self._states = dict(recent[-MAX_SERVERS:])
+        data = {
+            "version": FORMAT_VERSION,
+            "servers": {
+                server: dataclasses.asdict(state)
+                for server, state in self._states.items()
+            },
+        }
+        try:
+            os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+            with open(f"{self._path}.tmp", "w", encoding="utf-8") as file:
+                json.dump(data, file, separators=(",", ":"))
+            os.replace(f"{self._path}.tmp", self._path)
+        except OSError as ex:
+            _logger.warning(f"Failed to save the player state: {ex}")
+            return
+
+        _logger.debug("Saved player state to %s", self._path)
+
+    def _load(self) -> dict[str, SavedState]:
+        start = time.perf_counter()
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as ex:
+            _logger.warning(f"Failed to read the saved player state: {ex}")
+            return {}
+
+        if not isinstance(data, dict) or data.get("version") != FORMAT_VERSION:
+            return {}
+
+        servers = data.get("servers")
+        if not isinstance(servers, dict):
+            return {}
+
+        states = {}
+        for server, value in servers.items():
+            state = _parse(value)
+            if state is not None:
+                states[server] = state
+        _logger.debug(
+            "Loaded player state in %.1f ms", (time.perf_counter() - start) * 1000
+        )
+        return states
@@ -0,0 +1,94 @@
+import builtins
+import sys
+import time
+
+# Imports shorter than this are left out of the report (ms)
+MIN_IMPORT_TIME = 1.0
+
+
+class StartupProfiler:
+    """Records import times and startup milestones, see --startup-profile.
+
+    Imports are timed by wrapping builtins.__import__, the same way
+    `python -X importtime` does: cumulative time includes nested imports,
+    self time does not.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._original_import = builtins.__import__
+        self._stack: list[float] = []
+        self._imports: list[tuple[str, float, float]] = []
+        self._milestones: list[tuple[str, float]] = []
+        self._reported = False
+
+    def install(self):
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        builtins.__import__ = self._original_import
+
+    def mark(self, milestone: str):
+        self._milestones.append((milestone, time.perf_counter() - self._started))
+
+    def report(self, limit: int = 20):
+        """Prints the milestones and the slowest imports to stderr, once."""
+        if self._reported:
+            return
+        self._reported = True
+        self.uninstall()
+
+        lines = ["Startup profile (ms since start):"]
+        for milestone, elapsed in self._milestones:
+            lines.append(f"  {elapsed * 1000:8.1f}  {milestone}")
+
+        lines.append("Slowest imports (cumulative ms, self ms):")
+        imports = sorted(self._imports, key=lambda entry: entry[1], reverse=True)
+        for name, cumulative, own in imports[:limit]:
+            if cumulative * 1000 < MIN_IMPORT_TIME:
+                break
+            lines.append(f"  {cumulative * 1000:8.1f}  {own * 1000:8.1f}  {name}")
+        print("\n".join(lines), file=sys.stderr)
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules and not fromlist:
+            return self._original_import(name, globals, locals, fromlist, level)
+
+        loaded = len(sys.modules)
+        started = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            return self._original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+            # Only imports that actually loaded something are interesting
+            if len(sys.modules) > loaded:
+                if level and globals:
+                    package = globals.get("__package__") or ""
+                    package = package.rsplit(".", level - 1)[0]
+                    name = f"{package}.{name}" if name else package
+                self._imports.append((name, elapsed, elapsed - nested))
+
+
+_profiler: StartupProfiler | None = None
+
+
+def start_profiler() -> StartupProfiler:
+    global _profiler
+    _profiler = StartupProfiler()
+    _profiler.install()
+    return _profiler
+
+
+def mark(milestone: str):
+    """Records a startup milestone if profiling is enabled."""
+    if _profiler is not None:
+        _profiler.mark(milestone)
+
+
+def report():
+    if _profiler is not None:
+        _profiler.report()
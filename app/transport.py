@@ -0,0 +1,96 @@
+import dataclasses
+
+from PySide6.QtCore import QUrl
+from PySide6.QtNetwork import QNetworkReply, QNetworkRequest
+
+# Set on replies aborted on purpose, transfer timeouts abort replies with
+# the same error.
+CANCELLED_PROPERTY = "cancelled"
+
+
+@dataclasses.dataclass(frozen=True)
+class RequestProfile:
+    priority: QNetworkRequest.Priority
+    # Transfer timeout, the request is aborted when no data arrived (ms)
+    timeout: int
+    # HTTP/1.1 pipelining, only for small idempotent requests so nothing
+    # important ends up queued behind a slow download on one connection
+    pipelining: bool = False
+
+
+# Commands are sent ahead of polls, polls ahead of artwork
+COMMAND = RequestProfile(QNetworkRequest.Priority.HighPriority, 5000)
+POLL = RequestProfile(QNetworkRequest.Priority.NormalPriority, 10000, True)
+ARTWORK = RequestProfile(QNetworkRequest.Priority.LowPriority, 30000)
+
+
+def build_request(url: str, profile: RequestProfile) -> QNetworkRequest:
+    """Creates a request tuned for profile.
+
+    Connections are kept alive and reused by the access manager. HTTP/2 is
+    used when the server negotiates it (over TLS), plain HTTP stays on
+    HTTP/1.1 since h2c would break servers that do not speak it.
+    """
+    request = QNetworkRequest(QUrl(url))
+    request.setPriority(profile.priority)
+    request.setTransferTimeout(profile.timeout)
+    request.setAttribute(QNetworkRequest.Attribute.Http2AllowedAttribute, True)
+    request.setAttribute(
+        QNetworkRequest.Attribute.HttpPipeliningAllowedAttribute, profile.pipelining
+    )
+    return request
+
+
+def cancel_reply(reply: QNetworkReply):
+    """Aborts a reply so that it is not mistaken for a timeout."""
+    reply.setProperty(CANCELLED_PROPERTY, True)
+    reply.abort()
+
+
+def _is_aborted(reply: QNetworkReply) -> bool:
+    return reply.error() == QNetworkReply.NetworkError.OperationCanceledError
+
+
+def is_cancelled(reply: QNetworkReply) -> bool:
+    return _is_aborted(reply) and bool(reply.property(CANCELLED_PROPERTY))
+
+
+def is_timeout(reply: QNetworkReply) -> bool:
+    return _is_aborted(reply) and not reply.property(CANCELLED_PROPERTY)
+
+
+class ConnectionStats:
+    """Counts how often requests could reuse an open connection."""
+
+    def __init__(self):
+        self._requests = 0
+        self._connections = 0
+        self._http2 = 0
+        self._pipelined = 0
+        self._timeouts = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "requests": self._requests,
+            "connections": self._connections,
+            "reused": self._requests - self._connections,
+            "http2": self._http2,
+            "pipelined": self._pipelined,
+            "timeouts": self._timeouts,
+        }
+
+    def track(self, reply: QNetworkReply):
+        self._requests += 1
+        reply.socketStartedConnecting.connect(self._handle_connecting)
+        reply.finished.connect(lambda: self._handle_finished(reply))
+
+    def _handle_connecting(self):
+        self._connections += 1
+
+    def _handle_finished(self, reply: QNetworkReply):
+        if reply.attribute(QNetworkRequest.Attribute.Http2WasUsedAttribute):
+            self._http2 += 1
+        if reply.attribute(QNetworkRequest.Attribute.HttpPipeliningWasUsedAttribute):
+            self._pipelined += 1
+        if is_timeout(reply):
+            self._timeouts += 1
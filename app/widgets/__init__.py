@@ -1,3 +1,4 @@
 from .elidedlabel import ElidedLabel
 from .mediaplayertrayicon import MediaPlayerTrayIcon
+from .trackprogressbar import TrackProgressBar
 from .miniplayer import MiniPlayerWidget
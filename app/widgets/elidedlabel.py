@@ -1,37 +1,217 @@
-from PySide6.QtCore import Qt
-from PySide6.QtGui import QFontMetrics, QPainter
+from collections import OrderedDict
+
+from PySide6.QtCore import QEvent, QSize, Qt, QTimer
+from PySide6.QtGui import QFont, QFontMetrics, QPainter, QPalette, QPixmap
 from PySide6.QtWidgets import QLabel
 
+# Elided strings kept across all labels, keyed by (text, font, width)
+ELIDE_CACHE_SIZE = 64
+# Characters the size hint is wide enough for, the layout decides the rest
+SIZE_HINT_CHARS = 20
+
+# Marquee scrolling speed (px/s), one pixel per timer tick
+MARQUEE_SPEED = 30
+# Space between the end of the text and its repetition (px)
+MARQUEE_GAP = 40
+# Time the start of the text stays still on each pass (ms)
+MARQUEE_PAUSE = 2000
+
+# Change events after which the text is painted in another colour, from
+# another palette or colour group
+COLOR_CHANGE_EVENTS = frozenset(
+    {
+        QEvent.Type.PaletteChange,
+        QEvent.Type.EnabledChange,
+        QEvent.Type.ActivationChange,
+    }
+)
+
+_elide_cache: OrderedDict[tuple[str, str, int], str] = OrderedDict()
+
+
+def elide_text(text: str, font: QFont, metrics: QFontMetrics, width: int) -> str:
+    """Elides text on the right to fit width, memoized in a small LRU."""
+    key = (text, font.key(), width)
+    elided = _elide_cache.get(key)
+    if elided is not None:
+        _elide_cache.move_to_end(key)
+        return elided
+
+    elided = metrics.elidedText(text, Qt.TextElideMode.ElideRight, width)
+    _elide_cache[key] = elided
+    if len(_elide_cache) > ELIDE_CACHE_SIZE:
+        _elide_cache.popitem(last=False)
+    return elided
+
 
 class ElidedLabel(QLabel):
+    """Single line label that elides its text instead of growing.
+
+    The text is painted directly, QLabel's own text layout is never used.
+    The size hint only depends on the font, so changing the text repaints
+    the label without relayouting its window.
+
+    In marquee mode text that does not fit scrolls instead. It is rendered
+    once into a pixmap and every frame only blits it at the new offset. The
+    timer only runs while the label is visible and the text overflows.
+    """
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self._text = ""
         self._elided_text = ""
+        self._marquee = False
+        self._marquee_pixmap: QPixmap | None = None
+        self._marquee_offset = 0
+        self._marquee_period = 0
+        self._marquee_timer = QTimer(self, interval=1000 // MARQUEE_SPEED)
+        self._marquee_timer.timeout.connect(self._scroll)
+        self._marquee_pause_timer = QTimer(
+            self, interval=MARQUEE_PAUSE, singleShot=True
+        )
+        self._marquee_pause_timer.timeout.connect(self._marquee_timer.start)
+        self._update_font_metrics()
+
+    def isMarquee(self) -> bool:
+        return self._marquee
+
+    def setMarquee(self, marquee: bool):
+        if marquee == self._marquee:
+            return
+
+        self._marquee = marquee
+        self._reset_marquee()
+
+    def text(self) -> str:
+        return self._text
 
     def setText(self, text):
+        if text == self._text:
+            return
+
         self._text = text
         self.setToolTip(text)
         self.update_elided_text()
-        super().setText(self._elided_text)
+        self._reset_marquee()
 
     def update_elided_text(self):
-        font_metrics = QFontMetrics(self.font())
-        available_width = self.width()
-        self._elided_text = font_metrics.elidedText(
-            self._text, Qt.TextElideMode.ElideRight, available_width
+        elided_text = elide_text(
+            self._text, self.font(), self._font_metrics, self.width()
         )
-        super().setText(self._elided_text)
+        if elided_text != self._elided_text:
+            self._elided_text = elided_text
+            self.update()
+
+    def sizeHint(self) -> QSize:
+        return self._size_hint
+
+    def minimumSizeHint(self) -> QSize:
+        return QSize(0, self._size_hint.height())
+
+    def changeEvent(self, event: QEvent):
+        if event.type() == QEvent.Type.FontChange:
+            self._update_font_metrics()
+            self.updateGeometry()
+            self.update_elided_text()
+            self._reset_marquee()
+        elif event.type() in COLOR_CHANGE_EVENTS:
+            # The text colour is baked into the pixmap, the position stays
+            self._marquee_pixmap = None
+            self.update()
+        super().changeEvent(event)
+
+    def event(self, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.DevicePixelRatioChange:
+            self._reset_marquee()
+        return super().event(event)
 
     def resizeEvent(self, event):
-        self.update_elided_text()
+        if event.size().width() != event.oldSize().width():
+            self.update_elided_text()
+            self._update_marquee_timer()
+        self._update_baseline()
         super().resizeEvent(event)
 
+    def showEvent(self, event):
+        self._update_marquee_timer()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._update_marquee_timer()
+        super().hideEvent(event)
+
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.drawText(
-            0,
-            (self.height() - painter.fontMetrics().height()) / 2
-            + painter.fontMetrics().ascent(),
-            self._elided_text,
+        if not self._overflows():
+            painter.drawText(0, self._baseline, self._elided_text)
+            return
+
+        if self._marquee_pixmap is None:
+            self._marquee_pixmap = self._render_marquee()
+        # The pixmap holds the text and the gap, drawn twice for the wrap
+        x = -self._marquee_offset
+        y = self._baseline - self._font_metrics.ascent()
+        painter.drawPixmap(x, y, self._marquee_pixmap)
+        painter.drawPixmap(x + self._marquee_period, y, self._marquee_pixmap)
+
+    def _update_font_metrics(self):
+        self._font_metrics = QFontMetrics(self.font())
+        margins = self.contentsMargins()
+        self._size_hint = QSize(
+            self._font_metrics.averageCharWidth() * SIZE_HINT_CHARS,
+            self._font_metrics.height() + margins.top() + margins.bottom(),
         )
+        self._update_baseline()
+
+    def _overflows(self) -> bool:
+        return self._marquee and self._elided_text != self._text
+
+    def _reset_marquee(self):
+        self._marquee_pixmap = None
+        self._marquee_offset = 0
+        self._marquee_period = (
+            self._font_metrics.horizontalAdvance(self._text) + MARQUEE_GAP
+        )
+        self._marquee_timer.stop()
+        self._marquee_pause_timer.stop()
+        self._update_marquee_timer()
+        self.update()
+
+    def _update_marquee_timer(self):
+        if not self._overflows() or not self.isVisible():
+            self._marquee_timer.stop()
+            self._marquee_pause_timer.stop()
+            return
+
+        if self._marquee_timer.isActive() or self._marquee_pause_timer.isActive():
+            return
+
+        # Hold the start of the text before scrolling
+        if self._marquee_offset == 0:
+            self._marquee_pause_timer.start()
+        else:
+            self._marquee_timer.start()
+
+    def _scroll(self):
+        self._marquee_offset = (self._marquee_offset + 1) % self._marquee_period
+        if self._marquee_offset == 0:
+            self._marquee_timer.stop()
+            self._update_marquee_timer()
+        self.update()
+
+    def _render_marquee(self) -> QPixmap:
+        metrics = self._font_metrics
+        ratio = self.devicePixelRatioF()
+        pixmap = QPixmap(QSize(self._marquee_period, metrics.height()) * ratio)
+        pixmap.setDevicePixelRatio(ratio)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        painter = QPainter(pixmap)
+        painter.setFont(self.font())
+        painter.setPen(self.palette().color(QPalette.ColorRole.WindowText))
+        painter.drawText(0, metrics.ascent(), self._text)
+        painter.end()
+        return pixmap
+
+    def _update_baseline(self):
+        metrics = self._font_metrics
+        self._baseline = (self.height() - metrics.height()) // 2 + metrics.ascent()
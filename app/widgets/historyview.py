@@ -0,0 +1,93 @@
+import time
+
+from PySide6.QtCore import Qt, Slot
+from PySide6.QtWidgets import (
+    QHeaderView,
+    QTabWidget,
+    QTreeWidget,
+    QTreeWidgetItem,
+    QVBoxLayout,
+    QWidget,
+)
+
+from app.history import HistoryEntry, PlayHistory
+
+# Queries shown, one tab each
+TABS = (
+    ("most_played", "Most played this week"),
+    ("recently_liked", "Recently liked"),
+)
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 60 * 60:
+        return f"{max(int(seconds // 60), 1)} min ago"
+    if seconds < 24 * 60 * 60:
+        return f"{int(seconds // (60 * 60))} h ago"
+    return f"{int(seconds // (24 * 60 * 60))} d ago"
+
+
+class HistoryView(QWidget):
+    """Most played and recently liked tracks from the play history.
+
+    The queries run on the history thread each time the view is shown,
+    the lists are filled when the answers arrive.
+    """
+
+    def __init__(self, history: PlayHistory, parent=None):
+        super().__init__(parent)
+        self.setWindowFlag(Qt.WindowType.Window)
+        self.setWindowTitle("History")
+        self.resize(420, 320)
+        self._history = history
+        history.queryFinished.connect(self._handle_query_finished)
+
+        self._tabs = QTabWidget(self)
+        self._trees: dict[str, QTreeWidget] = {}
+        for name, label in TABS:
+            tree = QTreeWidget(self._tabs)
+            tree.setHeaderLabels(["Title", "Artist", "Plays", ""])
+            tree.setRootIsDecorated(False)
+            tree.setUniformRowHeights(True)
+            header = tree.header()
+            header.setStretchLastSection(False)
+            header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+            for column in (1, 2, 3):
+                header.setSectionResizeMode(
+                    column, QHeaderView.ResizeMode.ResizeToContents
+                )
+            self._tabs.addTab(tree, label)
+            self._trees[name] = tree
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self._tabs)
+
+    def refresh(self):
+        for name in self._trees:
+            self._history.requestQuery(name)
+
+    @Slot(str, object)  # type: ignore
+    def _handle_query_finished(self, name: str, entries: list[HistoryEntry]):
+        tree = self._trees.get(name)
+        if tree is None:
+            return
+
+        now = time.time()
+        tree.clear()
+        tree.addTopLevelItems(
+            [
+                QTreeWidgetItem(
+                    [
+                        entry.title,
+                        entry.artist,
+                        str(entry.plays),
+                        format_age(now - entry.time),
+                    ]
+                )
+                for entry in entries
+            ]
+        )
+
+    def showEvent(self, event):
+        self.refresh()
+        super().showEvent(event)
@@ -1,7 +1,8 @@
-import qtawesome as qta # type: ignore
 from PySide6.QtCore import Signal
 from PySide6.QtWidgets import QApplication, QMenu, QSystemTrayIcon
 
+from app.icons import IconRegistry
+
 
 class MediaPlayerTrayIcon(QSystemTrayIcon):
     triggered = Signal()
@@ -10,14 +11,19 @@ class MediaPlayerTrayIcon(QSystemTrayIcon):
         self.activated.connect(self._on_activated)
 
         context_menu = QMenu(parent)
+        self._icons = IconRegistry(context_menu, self)
+        self._icons.iconsChanged.connect(self._update_icons)
         self.exit_action = context_menu.addAction("Exit")
-        self.exit_action.setIcon(qta.icon("mdi.close"))
+        self.exit_action.setIcon(self._icons.icon("close"))
         self.exit_action.triggered.connect(QApplication.quit)
 
         self.setContextMenu(context_menu)
 
         self.installEventFilter(self)
     
+    def _update_icons(self):
+        self.exit_action.setIcon(self._icons.icon("close"))
+
     def _on_activated(self, reason):
         if reason == QSystemTrayIcon.ActivationReason.Trigger:
             self.triggered.emit()
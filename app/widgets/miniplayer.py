@@ -1,10 +1,30 @@
-import qtawesome as qta  # type: ignore
-from PySide6.QtCore import QCoreApplication, Qt, QTimer, Signal, Slot, QPoint
-from PySide6.QtGui import QIcon, QPixmap, QMouseEvent, QHideEvent
+import time
+import typing
+
+from PySide6.QtCore import (
+    QCoreApplication,
+    QEvent,
+    QObject,
+    Qt,
+    QTimer,
+    Signal,
+    Slot,
+    QPoint,
+)
+from PySide6.QtGui import QAction, QIcon, QPixmap, QMouseEvent, QHideEvent
 from PySide6.QtWidgets import QMenu, QSystemTrayIcon, QWidget
 
+from app.icons import IconRegistry
+from app.metrics import registry
+from app.playerstate import PlayerSnapshot
 from app.ui import ui_miniplayer
 
+if typing.TYPE_CHECKING:
+    from app.history import PlayHistory
+    from app.widgets.historyview import HistoryView
+
+ARTWORK_SIZE = 64
+
 
 class MiniPlayerWidget(QWidget):
     playPauseTriggered = Signal()
@@ -12,8 +32,10 @@ class MiniPlayerWidget(QWidget):
     previousTriggered = Signal()
     likeTriggered = Signal()
     dislikeTriggered = Signal()
+    visibilityChanged = Signal(bool)
+    targetSelected = Signal(int)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, tray_icon: QSystemTrayIcon | None = None):
         super().__init__(parent)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint | Qt.WindowType.WindowStaysOnTopHint | Qt.WindowType.Popup)
         
@@ -21,29 +43,34 @@ class MiniPlayerWidget(QWidget):
         self.ui = ui_miniplayer.Ui_MiniPlayer()
         self.ui.setupUi(self)
 
+        self._playing = False
+        self._liked = False
+        self._disliked = False
+        self._icons = IconRegistry(self)
+        self._icons.iconsChanged.connect(self._update_icons)
+
         menu = QMenu(self)
+        self._menu = menu
+        self._history_view: "HistoryView | None" = None
 
-        exit_action = menu.addAction("Exit")
-        exit_action.setIcon(qta.icon("mdi.close"))
-        exit_action.triggered.connect(QCoreApplication.quit)
+        self._exit_action = menu.addAction("Exit")
+        self._exit_action.triggered.connect(QCoreApplication.quit)
 
-        self._tray_icon = QSystemTrayIcon(self)
+        # The application may show the tray icon before the widget exists
+        if tray_icon is None:
+            tray_icon = QSystemTrayIcon(QIcon(":/icons/icon.png"), self)
+        self._tray_icon = tray_icon
         self._tray_icon.setContextMenu(menu)
         self._tray_icon.activated.connect(self._tray_activated)
+        self.setWindowIcon(self._tray_icon.icon())
 
-        icon = QIcon(":/icons/icon.png")
-        self._tray_icon.setIcon(icon)
-        self.setWindowIcon(icon)
-
-        self.ui.artworkLabel.setFixedSize(64, 64)
+        self.ui.artworkLabel.setFixedSize(ARTWORK_SIZE, ARTWORK_SIZE)
+        # Artwork arrives already scaled, don't rescale it on every paint
+        self.ui.artworkLabel.setScaledContents(False)
+        self.ui.artworkLabel.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.setFixedWidth(300)
 
-        self.ui.closeButton.setIcon(qta.icon("mdi.close"))
-        self.ui.playButton.setIcon(qta.icon("mdi.play"))
-        self.ui.nextButton.setIcon(qta.icon("mdi.skip-next"))
-        self.ui.previousButton.setIcon(qta.icon("mdi.skip-previous"))
-        self.ui.likeButton.setIcon(qta.icon("mdi.thumb-up-outline"))
-        self.ui.dislikeButton.setIcon(qta.icon("mdi.thumb-down-outline"))
+        self._update_icons()
 
         self.ui.closeButton.clicked.connect(self.hide)
         self.ui.playButton.clicked.connect(self.playPauseTriggered)
@@ -51,6 +78,8 @@ class MiniPlayerWidget(QWidget):
         self.ui.previousButton.clicked.connect(self.previousTriggered)
         self.ui.likeButton.clicked.connect(self.likeTriggered)
         self.ui.dislikeButton.clicked.connect(self.dislikeTriggered)
+        self.ui.targetComboBox.activated.connect(self.targetSelected)
+        self.ui.targetComboBox.hide()
 
         self._hide_timer = QTimer(self, interval=5000, singleShot=True)
         self._hide_timer.timeout.connect(self.hide)
@@ -60,35 +89,162 @@ class MiniPlayerWidget(QWidget):
         self._drag_position = QPoint()
         self._set_keep_open(False)
 
+        # Widgets changed by a setter mapped to the field and time of the change,
+        # cleared when they are painted to measure signal to repaint latency.
+        self._pending_repaints: dict[QObject, tuple[str, float]] = {}
+        for widget in (
+            self.ui.titleLabel,
+            self.ui.artistLabel,
+            self.ui.playButton,
+            self.ui.likeButton,
+            self.ui.dislikeButton,
+            self.ui.artworkLabel,
+        ):
+            widget.installEventFilter(self)
+
+    def artworkSize(self) -> int:
+        return ARTWORK_SIZE
+
+    def setMarquee(self, marquee: bool):
+        """Scrolls the title and artist when they do not fit."""
+        self.ui.titleLabel.setMarquee(marquee)
+        self.ui.artistLabel.setMarquee(marquee)
+
+    def setTargets(self, targets: list[str]):
+        """Sets the servers that can be controlled, hidden if only one."""
+        self.ui.targetComboBox.clear()
+        self.ui.targetComboBox.addItems(targets)
+        self.ui.targetComboBox.setVisible(len(targets) > 1)
+
+    def setHistory(self, history: "PlayHistory"):
+        """Adds a menu entry showing the play history."""
+        # Only loaded with --history
+        from app.widgets.historyview import HistoryView
+
+        self._history_view = HistoryView(history)
+        action = QAction("History", self._menu)
+        action.triggered.connect(self.showHistory)
+        self._menu.insertAction(self._exit_action, action)
+
+    @Slot()  # type: ignore
+    def showHistory(self):
+        if self._history_view is None:
+            return
+
+        self.hide()
+        self._history_view.show()
+        self._history_view.raise_()
+        self._history_view.activateWindow()
+
+    @Slot(int)  # type: ignore
+    def setActiveTarget(self, index: int):
+        self.ui.targetComboBox.setCurrentIndex(index)
+
+    @Slot(object, object)  # type: ignore
+    def applyState(self, snapshot: PlayerSnapshot, changed: frozenset[str]):
+        """Applies the changed fields of a snapshot in one pass."""
+        if "title" in changed:
+            self.ui.titleLabel.setText(snapshot.title)
+            self._mark_changed(self.ui.titleLabel, "title")
+        if "artist" in changed:
+            self.ui.artistLabel.setText(snapshot.artist)
+            self._mark_changed(self.ui.artistLabel, "artist")
+        if "playing" in changed:
+            self.setPlaying(snapshot.playing)
+        if "liked" in changed:
+            self.setLiked(snapshot.liked)
+        if "disliked" in changed:
+            self.setDisliked(snapshot.disliked)
+        if "artwork" in changed:
+            artwork = snapshot.artwork
+            self.setArtwork(
+                QPixmap.fromImage(artwork) if artwork is not None else QPixmap()
+            )
+        if "stale" in changed:
+            # Greyed out while showing the state of the last session
+            self.ui.titleLabel.setEnabled(not snapshot.stale)
+            self.ui.artistLabel.setEnabled(not snapshot.stale)
+        if changed & {"playing", "duration", "position"}:
+            self.ui.progressBar.setTiming(
+                snapshot.position,
+                snapshot.position_time,
+                snapshot.duration,
+                snapshot.playing,
+            )
+        # One tray tooltip update for both labels
+        if "title" in changed or "artist" in changed:
+            self._update_tooltip()
+
     @Slot(str)  # type: ignore
     def setTitle(self, title: str):
         self.ui.titleLabel.setText(title)
+        self._mark_changed(self.ui.titleLabel, "title")
         self._update_tooltip()
 
     @Slot(str)  # type: ignore
     def setArtist(self, artist: str):
         self.ui.artistLabel.setText(artist)
+        self._mark_changed(self.ui.artistLabel, "artist")
         self._update_tooltip()
 
     @Slot(bool)  # type: ignore
     def setPlaying(self, playing: bool):
-        self.ui.playButton.setIcon(qta.icon("mdi.pause" if playing else "mdi.play"))
+        if playing == self._playing:
+            return
+        self._playing = playing
+        self.ui.playButton.setIcon(self._icons.icon("pause" if playing else "play"))
+        self._mark_changed(self.ui.playButton, "playing")
 
     @Slot(bool)  # type: ignore
     def setLiked(self, liked: bool):
-        self.ui.likeButton.setIcon(
-            qta.icon("mdi.thumb-up" if liked else "mdi.thumb-up-outline")
-        )
+        if liked == self._liked:
+            return
+        self._liked = liked
+        self.ui.likeButton.setIcon(self._icons.icon("liked" if liked else "like"))
+        self._mark_changed(self.ui.likeButton, "liked")
 
     @Slot(bool)  # type: ignore
     def setDisliked(self, disliked: bool):
+        if disliked == self._disliked:
+            return
+        self._disliked = disliked
         self.ui.dislikeButton.setIcon(
-            qta.icon("mdi.thumb-down" if disliked else "mdi.thumb-down-outline")
+            self._icons.icon("disliked" if disliked else "dislike")
         )
+        self._mark_changed(self.ui.dislikeButton, "disliked")
 
     @Slot(QPixmap)  # type: ignore
     def setArtwork(self, artwork: QPixmap):
         self.ui.artworkLabel.setPixmap(artwork)
+        self._mark_changed(self.ui.artworkLabel, "artwork")
+
+    def eventFilter(self, watched: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint and watched in self._pending_repaints:
+            field, changed_at = self._pending_repaints.pop(watched)
+            registry.observe(
+                "ytmdr_repaint_latency_ms",
+                (time.perf_counter() - changed_at) * 1000,
+                {"field": field},
+            )
+        return super().eventFilter(watched, event)
+
+    def _mark_changed(self, widget: QObject, field: str):
+        # Hidden widgets are only painted once shown again, which says
+        # nothing about how responsive the remote is.
+        if self.isVisible() and widget not in self._pending_repaints:
+            self._pending_repaints[widget] = (field, time.perf_counter())
+
+    def _update_icons(self):
+        icons = self._icons
+        self._exit_action.setIcon(icons.icon("close"))
+        self.ui.closeButton.setIcon(icons.icon("close"))
+        self.ui.nextButton.setIcon(icons.icon("next"))
+        self.ui.previousButton.setIcon(icons.icon("previous"))
+        self.ui.playButton.setIcon(icons.icon("pause" if self._playing else "play"))
+        self.ui.likeButton.setIcon(icons.icon("liked" if self._liked else "like"))
+        self.ui.dislikeButton.setIcon(
+            icons.icon("disliked" if self._disliked else "dislike")
+        )
 
     def _set_keep_open(self, keep_open: bool):
         self.setWindowFlag(Qt.WindowType.Dialog, keep_open)
@@ -114,7 +270,12 @@ class MiniPlayerWidget(QWidget):
 
     def showEvent(self, event):
         self._hide_timer.start()
-        
+        self.visibilityChanged.emit(True)
+
+    def hideEvent(self, event: QHideEvent):
+        self._pending_repaints.clear()
+        self.visibilityChanged.emit(False)
+
     def enterEvent(self, event):
         self._hide_timer.stop()
 
@@ -0,0 +1,124 @@
+import time
+
+from PySide6.QtCore import QEvent, QRect, QSize, Qt, QTimer
+from PySide6.QtGui import QHelpEvent, QPainter, QPalette
+from PySide6.QtWidgets import QSizePolicy, QToolTip, QWidget
+
+BAR_HEIGHT = 3
+# Bounds of the timer interval (ms), it fires about once per pixel
+MIN_INTERVAL = 16
+MAX_INTERVAL = 1000
+
+
+def format_time(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return f"{hours}:{minutes:02}:{seconds:02}"
+    return f"{minutes}:{seconds:02}"
+
+
+class TrackProgressBar(QWidget):
+    """Thin bar showing the position in the current track.
+
+    The position is interpolated from the last synced one, see
+    PlayerSnapshot. The timer fires about once per pixel of progress and
+    only runs while playing and visible, and only the pixels that changed
+    are repainted.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._position = 0.0
+        self._position_time = 0.0
+        self._duration = 0.0
+        self._playing = False
+        self._filled = 0
+
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._update_filled)
+
+        # Every pixel is painted, nothing underneath needs repainting
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+        self.setFixedHeight(BAR_HEIGHT)
+
+    def position(self) -> float:
+        if not self._playing:
+            return self._position
+
+        position = self._position + time.monotonic() - self._position_time
+        return min(position, self._duration)
+
+    def duration(self) -> float:
+        return self._duration
+
+    def setTiming(
+        self, position: float, position_time: float, duration: float, playing: bool
+    ):
+        """Sets the position at the monotonic position_time."""
+        self._position = position
+        self._position_time = position_time
+        self._duration = duration
+        self._playing = playing
+        self._update_timer()
+        self._update_filled()
+
+    def sizeHint(self) -> QSize:
+        return QSize(100, BAR_HEIGHT)
+
+    def event(self, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.ToolTip and isinstance(event, QHelpEvent):
+            if self._duration:
+                position = format_time(self.position())
+                duration = format_time(self._duration)
+                QToolTip.showText(event.globalPos(), f"{position} / {duration}", self)
+            return True
+        return super().event(event)
+
+    def resizeEvent(self, event):
+        self._filled = self._filled_width()
+        self._update_timer()
+        super().resizeEvent(event)
+
+    def showEvent(self, event):
+        self._update_timer()
+        self._update_filled()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        palette = self.palette()
+        filled = QRect(0, 0, self._filled, self.height())
+        groove = QRect(self._filled, 0, self.width() - self._filled, self.height())
+        painter.fillRect(
+            filled & event.rect(), palette.color(QPalette.ColorRole.Highlight)
+        )
+        painter.fillRect(groove & event.rect(), palette.color(QPalette.ColorRole.Mid))
+
+    def _filled_width(self) -> int:
+        if not self._duration:
+            return 0
+        return round(self.width() * self.position() / self._duration)
+
+    def _update_filled(self):
+        filled = self._filled_width()
+        if filled == self._filled:
+            return
+
+        # Only the pixels between the old and the new end change
+        left = min(filled, self._filled)
+        self.update(QRect(left, 0, abs(filled - self._filled), self.height()))
+        self._filled = filled
+
+    def _update_timer(self):
+        if not self._playing or not self._duration or not self.isVisible():
+            self._timer.stop()
+            return
+
+        interval = self._duration * 1000 / max(self.width(), 1)
+        self._timer.start(int(min(max(interval, MIN_INTERVAL), MAX_INTERVAL)))
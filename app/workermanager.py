@@ -0,0 +1,255 @@
+import functools
+import logging
+import typing
+
+from PySide6.QtCore import QMetaObject, QObject, Qt, QThread, QTimer, Signal, Slot
+from PySide6.QtGui import QImage
+from PySide6.QtNetwork import QNetworkAccessManager
+
+from app.apiworker import ApiWorker
+from app.artworkcache import ArtworkCache
+from app.metrics import registry
+from app.playerstate import PlayerSnapshot
+from app.pollscheduler import PollPolicy
+from app.snapshotstore import SnapshotStore
+
+_logger = logging.getLogger(__name__)
+
+# Player actions mapped to the slots performing them on the active worker
+ACTIONS = {
+    "play": "requestPlay",
+    "pause": "requestPause",
+    "toggle": "requestTogglePlayPause",
+    "next": "requestNextTrack",
+    "previous": "requestPreviousTrack",
+    "like": "requestToggleLike",
+    "dislike": "requestToggleDislike",
+}
+
+
+class WorkerManager(QObject):
+    """Monitors several servers, one ApiWorker each.
+
+    The workers run on a thread of their own, with their own network
+    access manager, so replies are handled, decoded and parsed there and a
+    slow server never holds up the GUI. They share the network access
+    manager (and with it the connection pools) and the artwork cache, and
+    their polls are staggered so the servers are not hit in lockstep.
+
+    Requests are queued to the active worker. Workers only send immutable
+    PlayerSnapshots (artwork as QImage) back, the manager keeps the last
+    one of each and relays the active one's, the others keep polling at
+    the idle cadence in the background.
+
+    With a snapshot store the workers start from the state saved in the
+    last session, marked stale, which is emitted on start before anything
+    was polled. The store is moved to the worker thread.
+    """
+
+    titleChanged = Signal(str)
+    artistChanged = Signal(str)
+    playingChanged = Signal(bool)
+    likedChanged = Signal(bool)
+    dislikedChanged = Signal(bool)
+    artworkChanged = Signal(QImage)
+    commandFailed = Signal(str, str)
+    # See ApiWorker.stateChanged, diffed against what was last emitted
+    stateChanged = Signal(object, object)
+    activeIndexChanged = Signal(int)
+
+    def __init__(
+        self,
+        servers: list[str],
+        realtime: bool = False,
+        poll_policy: PollPolicy | None = None,
+        fetch_artwork: bool = True,
+        snapshot_store: SnapshotStore | None = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._poll_policy = poll_policy or PollPolicy()
+        # Owns everything that lives on the worker thread
+        self._thread = QThread(objectName="ApiWorkers")
+        self._host = QObject()
+        self._network_manager = QNetworkAccessManager(self._host)
+        self._artwork_cache = ArtworkCache()
+        registry.addCollector("ytmdr_artwork_cache", self._artwork_cache.stats)
+        self._fetch_artwork = fetch_artwork
+        self._active_index = 0
+        self._ui_visible = False
+        self._snapshot: PlayerSnapshot | None = None
+        if snapshot_store is not None:
+            snapshot_store.setParent(self._host)
+
+        self._workers: list[ApiWorker] = []
+        self._snapshots: list[PlayerSnapshot] = []
+        for server in servers:
+            worker = ApiWorker(
+                server=server,
+                realtime=realtime,
+                poll_policy=self._poll_policy,
+                artwork_cache=self._artwork_cache,
+                network_manager=self._network_manager,
+                fetch_artwork=fetch_artwork,
+                snapshot_store=snapshot_store,
+                parent=self._host,
+                objectName=server,
+            )
+            saved_state = snapshot_store.state(server) if snapshot_store else None
+            if saved_state is not None:
+                worker.restoreState(saved_state)
+            worker.stateChanged.connect(self._handle_worker_state_changed)
+            worker.commandFailed.connect(self._handle_worker_command_failed)
+            self._workers.append(worker)
+            self._snapshots.append(worker.snapshot())
+            # Collected on the metrics' thread, the counters are only read
+            registry.addCollector(
+                "ytmdr_commands", worker.commandStats, {"server": server}
+            )
+            registry.addCollector(
+                "ytmdr_connections", worker.connectionStats, {"server": server}
+            )
+
+        self._host.moveToThread(self._thread)
+        self._thread.finished.connect(self._host.deleteLater)
+
+    def workers(self) -> list[ApiWorker]:
+        return list(self._workers)
+
+    def activeIndex(self) -> int:
+        return self._active_index
+
+    def activeWorker(self) -> ApiWorker:
+        """The active worker, it lives on the worker thread."""
+        return self._workers[self._active_index]
+
+    def snapshot(self) -> PlayerSnapshot:
+        """The last state received from the active worker."""
+        return self._snapshots[self._active_index]
+
+    @Slot(int)
+    def setActiveIndex(self, index: int):
+        if index == self._active_index or not 0 <= index < len(self._workers):
+            return
+
+        self._invoke(self.activeWorker().setUiVisible, False)
+        self._active_index = index
+        worker = self.activeWorker()
+        self._invoke(worker.setUiVisible, self._ui_visible)
+        _logger.info(f"Controlling {worker.server()}")
+
+        # Bring whoever listens up to date with the new worker
+        self._emit_state(self.snapshot())
+        self.activeIndexChanged.emit(index)
+
+    def setArtworkSize(self, size: int, device_pixel_ratio: float = 1.0):
+        for worker in self._workers:
+            self._invoke(worker.setArtworkSize, size, device_pixel_ratio)
+
+    @Slot(bool)
+    def setUiVisible(self, visible: bool):
+        self._ui_visible = visible
+        self._invoke(self.activeWorker().setUiVisible, visible)
+
+    def start(self):
+        # Shows the restored state, if any, before the first poll
+        self._emit_state(self.snapshot())
+        self._thread.start()
+        # Spread the first polls over one interval, the schedulers keep
+        # them apart from there on.
+        step = self._poll_policy.interval / len(self._workers)
+        for i, worker in enumerate(self._workers):
+            self._invoke(
+                worker.setUiVisible, i == self._active_index and self._ui_visible
+            )
+            self._invoke(worker.start, int(i * step))
+
+    def stop(self):
+        """Stops the workers and waits for their thread to finish."""
+        if not self._thread.isRunning():
+            return
+
+        for worker in self._workers:
+            QMetaObject.invokeMethod(
+                worker, "stop", Qt.ConnectionType.BlockingQueuedConnection
+            )
+        self._thread.quit()
+        self._thread.wait()
+
+    @Slot(str)
+    def triggerAction(self, action: str):
+        slot = ACTIONS.get(action)
+        if slot is None:
+            _logger.warning(f"Unknown action: {action}")
+            return
+
+        getattr(self, slot)()
+
+    @Slot()
+    def requestPreviousTrack(self):
+        self._invoke(self.activeWorker().requestPreviousTrack)
+
+    @Slot()
+    def requestNextTrack(self):
+        self._invoke(self.activeWorker().requestNextTrack)
+
+    @Slot()
+    def requestToggleLike(self):
+        self._invoke(self.activeWorker().requestToggleLike)
+
+    @Slot()
+    def requestToggleDislike(self):
+        self._invoke(self.activeWorker().requestToggleDislike)
+
+    @Slot()
+    def requestTogglePlayPause(self):
+        self._invoke(self.activeWorker().requestTogglePlayPause)
+
+    @Slot()
+    def requestPlay(self):
+        self._invoke(self.activeWorker().requestPlay)
+
+    @Slot()
+    def requestPause(self):
+        self._invoke(self.activeWorker().requestPause)
+
+    @staticmethod
+    def _invoke(method: typing.Callable[..., typing.Any], *args):
+        """Queues a call to a worker method on the worker thread."""
+        QTimer.singleShot(0, method.__self__, functools.partial(method, *args))
+
+    @Slot(object, object)
+    def _handle_worker_state_changed(
+        self, snapshot: PlayerSnapshot, changed: frozenset[str]
+    ):
+        index = self._workers.index(self.sender())
+        self._snapshots[index] = snapshot
+        if index == self._active_index:
+            self._emit_state(snapshot)
+
+    @Slot(str, str)
+    def _handle_worker_command_failed(self, endpoint: str, error: str):
+        if self.sender() is self.activeWorker():
+            self.commandFailed.emit(endpoint, error)
+
+    def _emit_state(self, snapshot: PlayerSnapshot):
+        changed = snapshot.diff(self._snapshot)
+        if not changed:
+            return
+
+        self._snapshot = snapshot
+        # The per field signals follow the snapshot, on this thread
+        if "title" in changed:
+            self.titleChanged.emit(snapshot.title)
+        if "artist" in changed:
+            self.artistChanged.emit(snapshot.artist)
+        if "playing" in changed:
+            self.playingChanged.emit(snapshot.playing)
+        if "liked" in changed:
+            self.likedChanged.emit(snapshot.liked)
+        if "disliked" in changed:
+            self.dislikedChanged.emit(snapshot.disliked)
+        if "artwork" in changed and self._fetch_artwork:
+            artwork = snapshot.artwork
+            self.artworkChanged.emit(artwork if artwork is not None else QImage())
+        self.stateChanged.emit(snapshot, changed)
@@ -0,0 +1,214 @@
+"""Latency and throughput benchmarks for ApiWorker against the mock server.
+
+Run from the repository root, no display needed:
+
+    QT_QPA_PLATFORM=offscreen python -m bench.bench_apiworker
+
+Reports command to signal latency percentiles, requests per minute, bytes
+transferred, CPU time per poll, artwork fetch counts and connection reuse.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from PySide6.QtCore import QEventLoop, QTimer
+from PySide6.QtGui import QGuiApplication
+
+from app.apiworker import ApiWorker
+from app.artworkcache import ArtworkCache
+from app.pollscheduler import PollPolicy
+from bench.mockserver import MockConfig, MockServer
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    if not samples:
+        return {}
+
+    samples = sorted(samples)
+
+    def at(fraction: float) -> float:
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    return {
+        "count": len(samples),
+        "p50": at(0.50),
+        "p90": at(0.90),
+        "p99": at(0.99),
+        "max": samples[-1],
+        "mean": statistics.fmean(samples),
+    }
+
+
+def wait(ms: int):
+    loop = QEventLoop()
+    QTimer.singleShot(ms, loop.quit)
+    loop.exec()
+
+
+def wait_for(predicate, timeout: int = 5000) -> bool:
+    deadline = time.monotonic() + timeout / 1000
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        wait(1)
+    return True
+
+
+class Benchmark:
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.mock = MockServer(
+            MockConfig(
+                latency=args.latency / 1000,
+                error_rate=args.error_rate,
+                churn=args.churn,
+                etags=not args.no_etags,
+            )
+        )
+        self.mock.start()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.worker = ApiWorker(
+            server=self.mock.url,
+            poll_policy=PollPolicy(interval=args.interval),
+            artwork_cache=ArtworkCache(self.cache_dir.name),
+        )
+
+    def run(self) -> dict:
+        self.worker.start()
+        # Let the first poll and artwork fetch settle
+        wait_for(lambda: self.worker.title == self.mock.current_title())
+        wait(500)
+
+        return {
+            "idle": self.bench_idle(),
+            "play_pause": self.bench_play_pause(),
+            "next_track": self.bench_next_track(),
+            "artwork_cache": self.worker.artworkCache().stats(),
+            "commands": self.worker.commandStats(),
+            "connections": self.worker.connectionStats(),
+        }
+
+    def bench_idle(self) -> dict:
+        """Steady state polling while one track keeps playing."""
+        self.mock.reset_stats()
+        cpu_start = time.process_time()
+        start = time.monotonic()
+        wait(self.args.duration * 1000)
+        elapsed = time.monotonic() - start
+        cpu = time.process_time() - cpu_start
+
+        stats = self.mock.stats
+        polls = stats.requests.get("GET /track", 0)
+        return {
+            "seconds": elapsed,
+            "polls": polls,
+            "requests_per_minute": stats.total_requests() * 60 / elapsed,
+            "not_modified": stats.not_modified,
+            "bytes_sent": stats.bytes_sent,
+            "bytes_received": stats.bytes_received,
+            # Includes the mock server threads, compare runs like for like
+            "cpu_ms_per_poll": cpu * 1000 / max(polls, 1),
+            "artwork_fetches": stats.requests.get("GET /art", 0),
+        }
+
+    def bench_play_pause(self) -> dict:
+        signal_latencies = []
+        server_latencies = []
+        for _ in range(self.args.commands):
+            expected = not self.worker.isPlaying
+            sent = time.monotonic()
+            seen = len(self.mock.stats.commands)
+            self.worker.requestTogglePlayPause()
+            wait_for(lambda: self.worker.isPlaying == expected)
+            signal_latencies.append((time.monotonic() - sent) * 1000)
+            if wait_for(lambda: len(self.mock.stats.commands) > seen):
+                received = self.mock.stats.commands[seen][0]
+                server_latencies.append((received - sent) * 1000)
+            wait(self.args.spacing)
+
+        return {
+            "to_signal_ms": percentiles(signal_latencies),
+            "to_server_ms": percentiles(server_latencies),
+        }
+
+    def bench_next_track(self) -> dict:
+        self.mock.reset_stats()
+        latencies = []
+        artwork_latencies = []
+        for _ in range(self.args.commands):
+            previous = self.worker.title
+            artwork = self.worker.artwork
+            sent = time.monotonic()
+            self.worker.requestNextTrack()
+            if wait_for(lambda: self.worker.title != previous):
+                latencies.append((time.monotonic() - sent) * 1000)
+            if wait_for(lambda: self.worker.artwork is not artwork):
+                artwork_latencies.append((time.monotonic() - sent) * 1000)
+            wait(self.args.spacing)
+
+        return {
+            "to_title_ms": percentiles(latencies),
+            "to_artwork_ms": percentiles(artwork_latencies),
+            "artwork_fetches": self.mock.stats.requests.get("GET /art", 0),
+        }
+
+    def close(self):
+        self.worker.stop()
+        self.mock.stop()
+        self.cache_dir.cleanup()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=int, default=10, help="idle phase (s)")
+    parser.add_argument("--commands", type=int, default=20)
+    parser.add_argument(
+        "--spacing", type=int, default=100, help="between commands (ms)"
+    )
+    parser.add_argument(
+        "--interval", type=int, default=1000, help="poll interval (ms)"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="server latency (ms)"
+    )
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--churn", type=float, default=0, help="track length (s)")
+    parser.add_argument("--no-etags", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    args = parser.parse_args()
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication(sys.argv[:1])
+
+    benchmark = Benchmark(args)
+    try:
+        results = benchmark.run()
+    finally:
+        benchmark.close()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for section, values in results.items():
+            print(f"[{section}]")
+            for key, value in values.items():
+                if isinstance(value, dict):
+                    value = ", ".join(
+                        f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                        for k, v in value.items()
+                    )
+                elif isinstance(value, float):
+                    value = f"{value:.2f}"
+                print(f"  {key}: {value}")
+
+    del app
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Micro-benchmark for decoding the recorded API payloads in bench/payloads.
+
+Run from the repository root:
+
+    python -m bench.bench_payloads
+
+Times every installed JSON backend on its own and followed by the field
+extraction in app.payloads, per payload.
+"""
+
+import argparse
+import importlib
+import json
+import pathlib
+import sys
+import timeit
+import typing
+
+from app.payloads import JSON_BACKEND, parse_next_track, parse_state, parse_track
+
+PAYLOADS = pathlib.Path(__file__).with_name("payloads")
+
+# Payload file names mapped to the function extracting their fields
+PARSERS: dict[str, typing.Callable[[typing.Any], typing.Any]] = {
+    "track": parse_track,
+    "state": parse_state,
+    "queue": parse_next_track,
+}
+
+
+def backends() -> dict[str, typing.Callable[[bytes], typing.Any]]:
+    found: dict[str, typing.Callable[[bytes], typing.Any]] = {"json": json.loads}
+    for name, module, function in (
+        ("orjson", "orjson", "loads"),
+        ("msgspec", "msgspec.json", "decode"),
+    ):
+        try:
+            found[name] = getattr(importlib.import_module(module), function)
+        except ImportError:
+            pass
+    return found
+
+
+def measure(function: typing.Callable[[], typing.Any], number: int) -> float:
+    """Best of five runs, in microseconds per call."""
+    return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+
+def run(number: int) -> dict[str, dict[str, float]]:
+    results = {}
+    for name, parse in PARSERS.items():
+        body = (PAYLOADS / f"{name}.json").read_bytes()
+        timings = {}
+        for backend, loads in backends().items():
+            timings[backend] = measure(lambda: loads(body), number)
+            timings[f"{backend}+parse"] = measure(lambda: parse(loads(body)), number)
+        results[f"{name} ({len(body)} bytes)"] = timings
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000, help="calls per run")
+    parser.add_argument("--json", action="store_true", help="print raw JSON")
+    args = parser.parse_args()
+
+    results = run(args.number)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"Backend used by the remote: {JSON_BACKEND}")
+    for payload, timings in results.items():
+        print(f"[{payload}]")
+        for key, value in timings.items():
+            print(f"  {key}: {value:.2f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
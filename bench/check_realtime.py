@@ -0,0 +1,132 @@
+"""End to end check of ApiWorker's realtime transport against the mock server.
+
+Run from the repository root, no display needed:
+
+    QT_QPA_PLATFORM=offscreen python -m bench.check_realtime
+
+Connects over Socket.IO, checks that pushed changes arrive without polling,
+drops the connection, checks that polling takes over and that the worker
+reconnects. Exits with 1 if any step fails.
+"""
+
+import os
+import sys
+import tempfile
+
+from PySide6.QtGui import QGuiApplication
+
+from app.apiworker import REALTIME_RECONNECT_INTERVAL, ApiWorker
+from app.artworkcache import ArtworkCache
+from app.pollscheduler import PollPolicy
+from bench.bench_apiworker import wait, wait_for
+from bench.mockserver import MockConfig, MockServer
+
+# Short, so the fallback to polling shows quickly (ms)
+POLL_INTERVAL = 200
+# Short, so the heartbeat runs a few times during the check (s)
+PING_INTERVAL = 0.5
+
+
+class RealtimeCheck:
+    def __init__(self):
+        self.mock = MockServer(
+            MockConfig(realtime=True, ping_interval=PING_INTERVAL)
+        )
+        self.mock.start()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.worker = ApiWorker(
+            server=self.mock.url,
+            realtime=True,
+            poll_policy=PollPolicy(interval=POLL_INTERVAL),
+            artwork_cache=ArtworkCache(self.cache_dir.name),
+            fetch_artwork=False,
+        )
+        self.failures = 0
+
+    def polls(self) -> int:
+        return self.mock.stats.requests.get("GET /track/state", 0)
+
+    def step(self, name: str, ok: bool) -> bool:
+        print(f"{'ok' if ok else 'FAILED'}: {name}")
+        if not ok:
+            self.failures += 1
+        return ok
+
+    def assert_not_polling(self, name: str):
+        # Let the state fetched after connecting arrive first
+        wait(POLL_INTERVAL)
+        polls = self.polls()
+        wait(POLL_INTERVAL * 5)
+        self.step(name, self.polls() == polls)
+
+    def run(self):
+        worker, mock = self.worker, self.mock
+        worker.start()
+        if not self.step(
+            "connects", wait_for(lambda: worker.isRealtime() and mock.realtime_clients())
+        ):
+            return
+        self.step(
+            "fetches the state once",
+            wait_for(lambda: worker.title == mock.current_title()),
+        )
+        self.assert_not_polling("stops polling while connected")
+
+        polls = self.polls()
+        mock.change_track()
+        self.step(
+            "receives pushed tracks",
+            wait_for(lambda: worker.title == mock.current_title(), 1000)
+            and self.polls() == polls,
+        )
+        # Changed on the server, as by another remote
+        mock.handle_post("/track/like")
+        self.step(
+            "receives pushed state",
+            wait_for(lambda: worker.isLiked, 1000) and self.polls() == polls,
+        )
+
+        mock.drop_realtime()
+        self.step("notices the drop", wait_for(lambda: not worker.isRealtime(), 2000))
+        polls = self.polls()
+        self.step(
+            "falls back to polling",
+            wait_for(lambda: self.polls() >= polls + 2, POLL_INTERVAL * 10),
+        )
+        mock.change_track()
+        self.step(
+            "polls track changes",
+            wait_for(lambda: worker.title == mock.current_title(), POLL_INTERVAL * 10),
+        )
+
+        self.step(
+            "reconnects",
+            wait_for(
+                lambda: worker.isRealtime() and mock.realtime_clients(),
+                REALTIME_RECONNECT_INTERVAL + 3000,
+            ),
+        )
+        self.assert_not_polling("stops polling after reconnecting")
+
+    def close(self):
+        self.worker.stop()
+        self.mock.stop()
+        self.cache_dir.cleanup()
+
+
+def main() -> int:
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QGuiApplication(sys.argv[:1])
+
+    check = RealtimeCheck()
+    try:
+        check.run()
+    finally:
+        check.close()
+
+    del app
+    return 1 if check.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
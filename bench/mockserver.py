@@ -0,0 +1,482 @@
+"""Stand-in for the YTMDesktop remote API.
+
+Implements the endpoints ApiWorker uses with injectable latency, errors and
+track churn, and keeps request/byte counters for the benchmarks. Runs on a
+background thread so it can share a process with the Qt event loop.
+
+With realtime enabled it also accepts Socket.IO connections on /socket.io/
+(Engine.IO v4 over a websocket) and pushes "track" and "state" events when
+they change, like the realtime socket of the YTMDesktop companion server.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import select
+import socket
+import threading
+import time
+import typing
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+THUMBNAIL_SIZES = (60, 120, 226, 544)
+
+REALTIME_PATH = "/socket.io/"
+# Appended to Sec-WebSocket-Key in the handshake, see RFC 6455
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+
+@dataclass
+class MockConfig:
+    # Added to every reply (seconds)
+    latency: float = 0.0
+    # Fraction of requests answered with a 500
+    error_rate: float = 0.0
+    # Seconds between automatic track changes, 0 to never change
+    churn: float = 0.0
+    # Send ETags and honour If-None-Match
+    etags: bool = True
+    tracks: int = 20
+    # Accept Socket.IO connections and push changes over them
+    realtime: bool = False
+    # Seconds between Engine.IO pings
+    ping_interval: float = 25.0
+
+
+@dataclass
+class MockStats:
+    requests: dict[str, int] = field(default_factory=dict)
+    bytes_sent: int = 0
+    bytes_received: int = 0
+    not_modified: int = 0
+    errors: int = 0
+    # (monotonic time, path) of every command received
+    commands: list[tuple[float, str]] = field(default_factory=list)
+    realtime_connections: int = 0
+    realtime_pushes: int = 0
+
+    def total_requests(self) -> int:
+        return sum(self.requests.values())
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """An unmasked websocket frame, as sent by servers."""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 1 << 16:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, "big")
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, "big")
+    return header + payload
+
+
+class _RealtimeConnection:
+    """A websocket of a Socket.IO client, written to from any thread."""
+
+    def __init__(self, sock: socket.socket):
+        self._socket = sock
+        self._lock = threading.Lock()
+        # Connected to the default namespace, events are only pushed then
+        self.joined = False
+
+    def send(self, message: str):
+        self._send_frame(OPCODE_TEXT, message.encode())
+
+    def emit(self, event: str, data: typing.Any):
+        self.send("42" + json.dumps([event, data]))
+
+    def receive(self, timeout: float) -> str | None:
+        """The next text message, None once the connection is closed.
+
+        Raises TimeoutError if nothing arrives within timeout seconds.
+        """
+        while True:
+            ready, _, _ = select.select([self._socket], [], [], timeout)
+            if not ready:
+                raise TimeoutError
+            try:
+                opcode, payload = self._read_frame()
+            except OSError:
+                return None
+            if opcode == OPCODE_TEXT:
+                return payload.decode()
+            if opcode == OPCODE_PING:
+                self._send_frame(OPCODE_PONG, payload)
+            elif opcode == OPCODE_CLOSE:
+                self._send_frame(OPCODE_CLOSE, payload[:2])
+                return None
+
+    def drop(self):
+        """Closes the connection without a close frame, like a network drop."""
+        try:
+            self._socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _send_frame(self, opcode: int, payload: bytes):
+        with self._lock:
+            try:
+                self._socket.sendall(_frame(opcode, payload))
+            except OSError:
+                pass
+
+    def _read_frame(self) -> tuple[int, bytes]:
+        # Clients do not fragment the short messages Socket.IO sends
+        header = self._read(2)
+        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+        if length == 126:
+            length = int.from_bytes(self._read(2), "big")
+        elif length == 127:
+            length = int.from_bytes(self._read(8), "big")
+        mask = self._read(4) if header[1] & 0x80 else b""
+        payload = self._read(length)
+        if mask:
+            payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+        return opcode, payload
+
+    def _read(self, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = self._socket.recv(size - len(data))
+            if not chunk:
+                raise ConnectionResetError("Connection closed")
+            data += chunk
+        return data
+
+
+def _thumbnail(index: int, size: int) -> bytes:
+    """A small valid image, generated without Qt so any thread can serve it."""
+    # Binary PPM is supported by Qt's image readers out of the box
+    shade = (index * 37) % 256
+    header = f"P6 {size} {size} 255\n".encode()
+    return header + bytes((shade, 255 - shade, 128)) * (size * size)
+
+
+class MockServer:
+    def __init__(self, config: MockConfig | None = None, port: int = 0):
+        self.config = config or MockConfig()
+        self.stats = MockStats()
+        self._lock = threading.Lock()
+        self._track = 0
+        self._track_started = time.monotonic()
+        self._playing = True
+        self._liked = False
+        self._disliked = False
+        self._realtime_connections: set[_RealtimeConnection] = set()
+
+        server = self
+
+        class Handler(_Handler):
+            mock = server
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.drop_realtime()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = MockStats()
+
+    def change_track(self, step: int = 1):
+        with self._lock:
+            self._track = (self._track + step) % self.config.tracks
+            self._track_started = time.monotonic()
+            self._push_track()
+
+    def current_title(self) -> str:
+        return f"Track {self._track}"
+
+    def realtime_clients(self) -> int:
+        """Clients connected to the default namespace."""
+        with self._lock:
+            return sum(1 for c in self._realtime_connections if c.joined)
+
+    def drop_realtime(self):
+        """Drops every realtime connection, clients may connect again."""
+        with self._lock:
+            connections = list(self._realtime_connections)
+            self._realtime_connections.clear()
+        for connection in connections:
+            connection.drop()
+
+    # Request handling, called from the server threads
+
+    def _video(self, index: int) -> dict[str, typing.Any]:
+        return {
+            "videoId": f"video{index}",
+            "title": f"Track {index}",
+            "author": f"Artist {index % 5}",
+            "lengthSeconds": "180",
+            "thumbnail": {"thumbnails": self._thumbnails(index)},
+        }
+
+    def _thumbnails(self, index: int) -> list[dict[str, typing.Any]]:
+        return [
+            {"url": f"{self.url}/art/{index}/{size}", "width": size, "height": size}
+            for size in THUMBNAIL_SIZES
+        ]
+
+    def _track_data(self) -> dict[str, typing.Any]:
+        return {"video": self._video(self._track)}
+
+    def _state_data(self) -> dict[str, typing.Any]:
+        return {
+            "playing": self._playing,
+            "liked": self._liked,
+            "disliked": self._disliked,
+            "progress": int(time.monotonic() - self._track_started),
+        }
+
+    def _push(self, event: str, data: dict[str, typing.Any]):
+        for connection in self._realtime_connections:
+            if connection.joined:
+                connection.emit(event, data)
+                self.stats.realtime_pushes += 1
+
+    def _push_track(self):
+        self._push("track", self._track_data())
+        self._push("state", self._state_data())
+
+    def _churn(self):
+        churn = self.config.churn
+        if churn and time.monotonic() - self._track_started >= churn:
+            self._track = (self._track + 1) % self.config.tracks
+            self._track_started = time.monotonic()
+            self._push_track()
+
+    def handle_get(self, path: str) -> tuple[int, str, bytes]:
+        with self._lock:
+            self._churn()
+            if path == "/track":
+                return 200, "application/json", _json(self._track_data())
+            if path == "/track/state":
+                return 200, "application/json", _json(self._state_data())
+            if path == "/queue":
+                items = [
+                    {
+                        "videoId": f"video{i}",
+                        "title": f"Track {i}",
+                        "author": f"Artist {i % 5}",
+                        "thumbnails": self._thumbnails(i),
+                    }
+                    for i in range(self.config.tracks)
+                ]
+                return 200, "application/json", _json(
+                    {"items": items, "selectedItemIndex": self._track}
+                )
+            if path.startswith("/art/"):
+                _, _, index, size = path.split("/")
+                body = _thumbnail(int(index), int(size))
+                return 200, "image/x-portable-pixmap", body
+        return 404, "text/plain", b"Not found"
+
+    def handle_post(self, path: str) -> tuple[int, str, bytes]:
+        with self._lock:
+            self.stats.commands.append((time.monotonic(), path))
+            body: dict[str, typing.Any] = {}
+            if path == "/track/play":
+                self._playing = True
+                body = {"isPlaying": True}
+            elif path == "/track/pause":
+                self._playing = False
+                body = {"isPlaying": False}
+            elif path in ("/track/next", "/track/prev"):
+                step = 1 if path == "/track/next" else -1
+                self._track = (self._track + step) % self.config.tracks
+                self._track_started = time.monotonic()
+            elif path == "/track/like":
+                self._liked = not self._liked
+                self._disliked = False
+            elif path == "/track/dislike":
+                self._disliked = not self._disliked
+                self._liked = False
+            else:
+                return 404, "text/plain", b"Not found"
+            if path in ("/track/next", "/track/prev"):
+                self._push_track()
+            else:
+                self._push("state", self._state_data())
+        return 200, "application/json", _json(body)
+
+    def serve_realtime(self, connection: _RealtimeConnection):
+        """Runs an Engine.IO session until the client goes away."""
+        with self._lock:
+            self._realtime_connections.add(connection)
+            self.stats.realtime_connections += 1
+            sid = f"mock{self.stats.realtime_connections}"
+        interval = self.config.ping_interval
+        connection.send(
+            "0"
+            + json.dumps(
+                {
+                    "sid": sid,
+                    "upgrades": [],
+                    "pingInterval": int(interval * 1000),
+                    "pingTimeout": int(interval * 1000),
+                    "maxPayload": 1_000_000,
+                }
+            )
+        )
+        try:
+            while True:
+                try:
+                    message = connection.receive(interval)
+                except TimeoutError:
+                    connection.send("2")
+                    continue
+                if message is None or message == "1":
+                    break
+                if message.startswith("40"):
+                    # The full state is fetched over HTTP after connecting
+                    connection.send("40" + json.dumps({"sid": sid}))
+                    with self._lock:
+                        connection.joined = True
+                elif message.startswith("41"):
+                    with self._lock:
+                        connection.joined = False
+        finally:
+            with self._lock:
+                self._realtime_connections.discard(connection)
+            connection.drop()
+
+
+def _json(data: typing.Any) -> bytes:
+    return json.dumps(data).encode()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    mock: MockServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.mock.config.realtime and self.path.startswith(REALTIME_PATH):
+            self._upgrade()
+            return
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method: str):
+        mock = self.mock
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+
+        with mock._lock:
+            key = f"{method} {self.path}"
+            if self.path.startswith("/art/"):
+                key = f"{method} /art"
+            mock.stats.requests[key] = mock.stats.requests.get(key, 0) + 1
+            mock.stats.bytes_received += length + len(str(self.headers))
+
+        if mock.config.latency:
+            time.sleep(mock.config.latency)
+
+        if random.random() < mock.config.error_rate:
+            with mock._lock:
+                mock.stats.errors += 1
+            self._reply(500, "text/plain", b"Injected error")
+            return
+
+        if method == "GET":
+            status, content_type, body = mock.handle_get(self.path)
+        else:
+            status, content_type, body = mock.handle_post(self.path)
+
+        etag = None
+        if mock.config.etags and method == "GET" and status == 200:
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                with mock._lock:
+                    mock.stats.not_modified += 1
+                self._reply(304, content_type, b"", etag)
+                return
+
+        self._reply(status, content_type, body, etag)
+
+    def _upgrade(self):
+        """Completes a websocket handshake and serves Socket.IO over it."""
+        mock = self.mock
+        websocket_key = self.headers.get("Sec-WebSocket-Key")
+        if self.headers.get("Upgrade", "").lower() != "websocket" or not websocket_key:
+            self._reply(400, "text/plain", b"Expected a websocket upgrade")
+            return
+
+        with mock._lock:
+            key = f"GET {REALTIME_PATH}"
+            mock.stats.requests[key] = mock.stats.requests.get(key, 0) + 1
+        digest = hashlib.sha1((websocket_key + WEBSOCKET_GUID).encode()).digest()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", base64.b64encode(digest).decode())
+        self.end_headers()
+        self.close_connection = True
+        mock.serve_realtime(_RealtimeConnection(self.connection))
+
+    def _reply(self, status: int, content_type: str, body: bytes, etag=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.mock._lock:
+            # Status line and headers are roughly accounted for
+            self.mock.stats.bytes_sent += len(body) + 120
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=13091)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--churn", type=float, default=30.0)
+    parser.add_argument("--realtime", action="store_true")
+    args = parser.parse_args()
+
+    mock = MockServer(
+        MockConfig(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            churn=args.churn,
+            realtime=args.realtime,
+        ),
+        port=args.port,
+    )
+    print(f"Serving on {mock.url}")
+    mock.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        mock.stop()